@@ -0,0 +1,131 @@
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from tools.answer_cache import FailedAnswer
+
+NO_CONTEXT_ANSWER = "I don't have information about this in the video content."
+ERROR_ANSWER = FailedAnswer("I couldn't find specific information about that in the video content.")
+# Ends a stream the LLM failed partway through, after the tokens already shown
+INTERRUPTED_ANSWER = FailedAnswer("\n\n[The answer was interrupted by an error. Please ask again.]")
+
+DIRECT_SYSTEM_PROMPT = """You are a specialized assistant that ONLY answers questions based on the transcripts of provided YouTube videos.
+
+CRITICAL RULES YOU MUST FOLLOW:
+1. You have NO knowledge beyond the transcript excerpts given below.
+2. You can ONLY provide information that is EXPLICITLY mentioned in the transcript excerpts.
+3. If the information is not in the excerpts, you MUST respond with EXACTLY: "I don't have that information in the video content."
+4. NEVER make up information or use general knowledge.
+5. If asked about topics unrelated to the videos, respond with EXACTLY: "I can only answer questions about the content of the provided videos."
+6. Do not reference external sources, websites, or any information not in the videos.
+7. Do not offer opinions or interpretations beyond what is directly stated in the videos.
+
+Transcript excerpts:
+{context}"""
+
+
+def format_timestamp(seconds):
+    """Format an offset in seconds as m:ss or h:mm:ss."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def format_context(documents):
+    """Render retrieved chunks with their video and timestamp for the prompt."""
+    blocks = []
+    for document in documents:
+        metadata = document.metadata or {}
+        label = metadata.get("video_id", metadata.get("source", "video"))
+        if "start" in metadata:
+            label = f"{label} @ {format_timestamp(metadata['start'])}"
+        blocks.append(f"[{label}]\n{document.page_content}")
+    return "\n\n".join(blocks)
+
+
+class DirectVideoQA:
+    """Answer a question with one retrieval and one grounded LLM call.
+
+    A drop-in for the AgentExecutor in ``create_agent_node``: ``invoke``
+    takes ``{"input", "conversation_history"}`` and returns ``{"output"}``,
+    but skips the tool-selection round trip the agent always makes.
+    ``stream``/``astream`` yield the answer token by token instead. If
+    the LLM fails before any token, the stream is ``ERROR_ANSWER``; after
+    some, it ends with ``INTERRUPTED_ANSWER``. Both are ``FailedAnswer``s,
+    which the answer cache never stores.
+    """
+
+    streams_tokens = True
+
+    def __init__(self, llm, retriever):
+        self.llm = llm
+        self.retriever = retriever
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", DIRECT_SYSTEM_PROMPT),
+            MessagesPlaceholder(variable_name="conversation_history", optional=True),
+            ("human", "{input}"),
+        ])
+
+    def _messages(self, query, documents, conversation_history):
+        return self.prompt.format_messages(
+            context=format_context(documents),
+            conversation_history=conversation_history or [],
+            input=query,
+        )
+
+    def invoke(self, inputs):
+        return {"input": inputs["input"], "output": "".join(self.stream(inputs))}
+
+    async def ainvoke(self, inputs):
+        return {"input": inputs["input"], "output": "".join([token async for token in self.astream(inputs)])}
+
+    def stream(self, inputs):
+        """Yield answer tokens as the LLM produces them."""
+        query = inputs["input"]
+        emitted = False
+        try:
+            documents = self.retriever.invoke(query)
+
+            # Same refusal as the agent's tool when nothing was retrieved
+            if not documents:
+                yield NO_CONTEXT_ANSWER
+                return
+
+            for chunk in self.llm.stream(self._messages(query, documents, inputs.get("conversation_history"))):
+                if chunk.content:
+                    emitted = True
+                    yield chunk.content
+        except Exception as e:
+            print(f"Error in direct QA: {e}")
+            yield INTERRUPTED_ANSWER if emitted else ERROR_ANSWER
+
+    async def aanswer_from_documents(self, query, documents, conversation_history=None):
+        """Answer from chunks retrieved elsewhere (e.g. a batched retrieval)."""
+        if not documents:
+            return NO_CONTEXT_ANSWER
+        try:
+            response = await self.llm.ainvoke(self._messages(query, documents, conversation_history))
+            return response.content
+        except Exception as e:
+            print(f"Error in direct QA: {e}")
+            return ERROR_ANSWER
+
+    async def astream(self, inputs):
+        """Async iterator over answer tokens."""
+        query = inputs["input"]
+        emitted = False
+        try:
+            documents = await self.retriever.ainvoke(query)
+
+            if not documents:
+                yield NO_CONTEXT_ANSWER
+                return
+
+            async for chunk in self.llm.astream(self._messages(query, documents, inputs.get("conversation_history"))):
+                if chunk.content:
+                    emitted = True
+                    yield chunk.content
+        except Exception as e:
+            print(f"Error in direct QA: {e}")
+            yield INTERRUPTED_ANSWER if emitted else ERROR_ANSWER
@@ -5,37 +5,29 @@ from tools.chromadb_tool import store_embeddings
 from qa_agent import get_response
 
 # Node: fetch transcript + chunk + accumulate
-import os
-import pickle
 from tqdm import tqdm
-from tools.youtube_tool import get_youtube_transcript
-
-# Cache folder
-CACHE_DIR = "cache"
+from tools.chunking import chunk_transcript
+from tools.chunk_store import current_chunking, get_chunk_store
+from tools.utils import extract_video_id
 
 def load_video_transcripts_node(state):
     video_urls = state.get("video_urls", [])
     all_chunks = []
     
-    # Ensure cache directory exists
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
+    # Chunks are shared with main.process_videos_node through the chunk store
+    store, chunking = get_chunk_store(), current_chunking()
 
-    # Check cache for each video URL
     for url in tqdm(video_urls, desc="Fetching transcripts"):
-        cache_filename = os.path.join(CACHE_DIR, f"{url.split('v=')[1]}.pkl")
+        video_id = extract_video_id(url) or url
+        chunks = store.get(video_id, chunking)
         
-        # If cached data exists, load it
-        if os.path.exists(cache_filename):
-            with open(cache_filename, "rb") as f:
-                chunks = pickle.load(f)
+        if chunks:
             tqdm.write(f"Loaded cached data for: {url}")
         else:
-            transcript = get_youtube_transcript(url)
-            chunks = [{"page_content": " ".join(transcript[i:i + 100])} for i in range(0, len(transcript), 100)]
+            transcript = get_youtube_transcript(url, with_timestamps=True)
+            chunks = chunk_transcript(url, transcript)
             # Cache the chunks for future use
-            with open(cache_filename, "wb") as f:
-                pickle.dump(chunks, f)
+            store.put(video_id, url, chunks, chunking)
             tqdm.write(f"Fetched new data for: {url}")
 
         all_chunks.extend(chunks)
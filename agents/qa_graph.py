@@ -1,6 +1,7 @@
 from langgraph.graph import StateGraph, END
 from langchain_core.runnables import RunnableLambda
 from tools.youtube_tool import get_youtube_transcript
+from tools.chunking import chunk_transcript
 from tools.chromadb_tool import store_embeddings, query_vector_store
 from agents.qa_agent import get_response
 
@@ -17,7 +18,7 @@ def process_chunks(state):
         raise ValueError("No valid chunks found from any videos")
     
     transcript = state["transcript"]
-    chunks = [{"page_content": " ".join(transcript[i:i+100])} for i in range(0, len(transcript), 100)]
+    chunks = chunk_transcript(state["url"], transcript)
     return {"chunks": chunks, **state}
 
 # 3. Node: Embed and store
@@ -1,8 +1,16 @@
 import streamlit as st
-from tools.utils import fetch_video_metadata
-from main import build_graph_and_agent
+from tools.utils import fetch_videos_metadata
+from main import build_graph_and_agent, get_ingest_jobs, stream_answer
+from config import get_setting
 import os
 
+STATUS_LABELS = {
+    "queued": "⏳ Queued",
+    "running": "⚙️ Processing",
+    "done": "✅ Ready",
+    "failed": "❌ Failed",
+}
+
 # Set up the page configuration
 st.set_page_config(page_title="YouTube QA Bot", page_icon="🎥")
 
@@ -24,6 +32,46 @@ if "videos_submitted" not in st.session_state:
     st.session_state.videos_submitted = False
 if "valid_urls" not in st.session_state:
     st.session_state.valid_urls = []
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
+if "agent_urls" not in st.session_state:
+    st.session_state.agent_urls = []
+if "job_state" not in st.session_state:
+    st.session_state.job_state = None
+
+# A reconnecting browser picks its ingest job back up from the URL
+if st.session_state.job_id is None and st.query_params.get("job"):
+    job = get_ingest_jobs().status(st.query_params["job"])
+    if job:
+        st.session_state.job_id = job["id"]
+        st.session_state.valid_urls = job["urls"]
+        st.session_state.videos_submitted = True
+
+
+def job_state(job):
+    """What the rest of the page depends on: the ready videos and whether the job is finished."""
+    return tuple(video["url"] for video in job["videos"] if video["status"] == "done"), job["status"]
+
+
+def show_progress():
+    """Show per-video ingest progress; rerun the page once more videos are ready."""
+    job = get_ingest_jobs().status(st.session_state.job_id)
+    if job is None:
+        st.error("This ingest job no longer exists. Please process the videos again.")
+        return
+    finished = job["done"] + job["failed"]
+    text = f"{job['done']} of {job['total']} videos ready"
+    if job["failed"]:
+        text += f", {job['failed']} failed"
+    st.progress(finished / max(job["total"], 1), text=text)
+    for video in job["videos"]:
+        line = f"{STATUS_LABELS.get(video['status'], video['status'])} — {video['url']}"
+        if video["error"]:
+            line += f": {video['error']}"
+        st.caption(line)
+    # Newly ready videos change the agent, which lives outside this fragment
+    if job_state(job) != st.session_state.job_state:
+        st.rerun()
 
 # Only show the URL input if videos haven't been submitted yet
 if not st.session_state.videos_submitted:
@@ -38,10 +86,11 @@ if not st.session_state.videos_submitted:
         # Process URLs when the button is clicked
         urls = [url.strip() for url in video_urls.strip().split("\n") if url.strip()]
         
-        # Fetch metadata and check for valid data
+        # Fetch metadata for all URLs in one batched call and check for valid data
+        metadata_by_url = fetch_videos_metadata(urls)
         valid_urls = []
         for url in urls:
-            metadata = fetch_video_metadata(url)
+            metadata = metadata_by_url.get(url)
             if metadata:
                 valid_urls.append(url)
                 # Display video information in a cleaner format
@@ -58,20 +107,21 @@ if not st.session_state.videos_submitted:
                 st.warning(f"Could not fetch metadata for {url}. Please ensure the URL is valid.")
         
         if valid_urls:
-            with st.spinner("Processing videos... This may take a minute."):
-                # Initialize agent with valid URLs
-                st.session_state.agent = build_graph_and_agent(valid_urls)
-                st.session_state.valid_urls = valid_urls
-                st.session_state.videos_submitted = True
-                st.success("Videos processed successfully! You can now ask questions.")
-                st.rerun()  # Updated from experimental_rerun to rerun
+            # Ingest runs in the background; questions can start once a video is ready
+            st.session_state.job_id = get_ingest_jobs().submit(valid_urls)
+            st.query_params["job"] = st.session_state.job_id
+            st.session_state.valid_urls = valid_urls
+            st.session_state.videos_submitted = True
+            st.rerun()  # Updated from experimental_rerun to rerun
         else:
             st.error("No valid URLs provided.")
 else:
     # Display the videos that were processed
     st.subheader("Processed Videos:")
+    # Served from the metadata cache, so reruns don't hit the network
+    metadata_by_url = fetch_videos_metadata(st.session_state.valid_urls)
     for url in st.session_state.valid_urls:
-        metadata = fetch_video_metadata(url)
+        metadata = metadata_by_url.get(url)
         if metadata:
             st.markdown(f"""
                 <div style="background-color:#f9f9f9; border-radius:8px; padding:10px; margin:15px 0; box-shadow:0 4px 6px rgba(0,0,0,0.1);">
@@ -81,46 +131,70 @@ else:
                 </div>
             """, unsafe_allow_html=True)
     
+    # Ingest progress, refreshed in place while the job is running
+    if st.session_state.job_id:
+        job = get_ingest_jobs().status(st.session_state.job_id)
+        if job is not None:
+            st.session_state.job_state = job_state(job)
+            ready_urls = list(st.session_state.job_state[0])
+            # Ask about the videos that are ready while the rest finish
+            if ready_urls and ready_urls != st.session_state.agent_urls:
+                st.session_state.agent = build_graph_and_agent(ready_urls)
+                st.session_state.agent_urls = ready_urls
+        running = job is not None and job["status"] not in ("done", "failed")
+        if running and hasattr(st, "fragment"):
+            st.fragment(run_every=get_setting("ingest_jobs.poll_interval", 2))(show_progress)()
+        else:
+            show_progress()
+            if running:
+                st.button("Refresh progress")
+    
     # Add a button to reset and add new videos
     if st.button("Process different videos"):
         st.session_state.videos_submitted = False
         st.session_state.agent = None
         st.session_state.chat_history = []
         st.session_state.valid_urls = []
+        st.session_state.job_id = None
+        st.session_state.agent_urls = []
+        st.session_state.job_state = None
+        st.query_params.clear()
         st.rerun()  # Updated from experimental_rerun to rerun
 
 # Initialize chat UI if agent exists
 if st.session_state.agent:
     st.markdown("---")
     st.subheader("Ask your questions below:")
+    if st.session_state.job_state and st.session_state.job_state[1] not in ("done", "failed"):
+        st.info(f"Answering from the {len(st.session_state.agent_urls)} videos ready so far; "
+                "the others are still being processed.")
 
     user_query = st.text_input("Your question:", key="user_input")
     ask_btn = st.button("Ask")
 
     if ask_btn and user_query:
-        with st.spinner("Getting answer..."):
-            try:
-                # Modify how we invoke the agent to handle iteration limits
-                response = st.session_state.agent.invoke({
+        # Render the answer token by token while it is generated
+        live_answer = st.empty()
+        try:
+            with live_answer.container():
+                st.markdown(f"**You:** {user_query}")
+                st.markdown("**Bot:**")
+                answer = st.write_stream(stream_answer(st.session_state.agent, {
                     "input": user_query  # Simplified query without prefix
-                })
-                
-                # Extract the answer from the response
-                if isinstance(response, dict) and "output" in response:
-                    answer = response["output"]
-                elif isinstance(response, str):
-                    answer = response
-                else:
-                    answer = "I couldn't find specific information about that in the video content."
-                
-                # Add to chat history
-                st.session_state.chat_history.append(("user", user_query))
-                st.session_state.chat_history.append(("ai", answer))
-            except Exception as e:
-                st.error(f"Error: {e}")
-                st.session_state.chat_history.append(("user", user_query))
-                st.session_state.chat_history.append(("ai", "I couldn't find information about that in the video content."))
-                answer = "Sorry, I couldn't process your question. Please try again."
+                }))
+            if not isinstance(answer, str) or not answer:
+                answer = "I couldn't find specific information about that in the video content."
+            
+            # Add to chat history
+            st.session_state.chat_history.append(("user", user_query))
+            st.session_state.chat_history.append(("ai", answer))
+        except Exception as e:
+            st.error(f"Error: {e}")
+            st.session_state.chat_history.append(("user", user_query))
+            st.session_state.chat_history.append(("ai", "I couldn't find information about that in the video content."))
+            answer = "Sorry, I couldn't process your question. Please try again."
+        # The finished answer is shown in the chat history below
+        live_answer.empty()
 
     # Display chat history in reverse order (most recent at the top)
     if st.session_state.chat_history:
@@ -0,0 +1,165 @@
+"""Answer a file of questions about YouTube videos in bulk.
+
+Input is JSONL, one question per line:
+
+    {"id": "q1", "urls": ["https://www.youtube.com/watch?v=..."], "question": "..."}
+
+Rows are grouped by video set so each set is indexed once. Every question
+in the file is embedded in one batched call, each group's retrieval is one
+batched vector search, and LLM calls run concurrently up to
+``batch.max_concurrency``. Results are appended to the output JSONL as
+they finish, with per-row timings:
+
+    python batch.py questions.jsonl answers.jsonl --concurrency 16
+
+Batch runs bypass the answer cache, so evaluations always exercise
+retrieval and the LLM.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from config import get_setting
+from main import aanswer, abuild_graph_and_agent
+from tools.metrics import count_items, timed
+from tools.utils import extract_video_id
+
+
+def read_rows(path):
+    """Load question rows; ``id`` defaults to the line number."""
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            urls = row.get("urls")
+            if isinstance(urls, str):
+                urls = [urls]
+            if not urls or not row.get("question"):
+                raise ValueError(f"{path}:{line_number}: each row needs 'urls' and 'question'")
+            rows.append({"id": row.get("id", line_number), "urls": list(urls), "question": row["question"]})
+    return rows
+
+
+def group_rows(rows):
+    """Group rows by video set, whatever the order or form of their urls."""
+    groups = {}
+    for row in rows:
+        key = tuple(sorted({extract_video_id(url) or url for url in row["urls"]}))
+        groups.setdefault(key, []).append(row)
+    return list(groups.values())
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class BatchRunner:
+    """Run grouped question rows and write one JSON result line per row.
+
+    Groups are indexed one after another (each ingest already fetches and
+    embeds in parallel) while the LLM calls of earlier groups keep running,
+    bounded by one semaphore across the whole batch. ``index_ms`` and
+    ``retrieve_ms`` are per group, shared by its rows; ``answer_ms`` is the
+    row's own LLM call (retrieval included in agent mode).
+    """
+
+    def __init__(self, out, max_concurrency=None):
+        if max_concurrency is None:
+            max_concurrency = get_setting("batch.max_concurrency", 8)
+        self.out = out
+        self._llm_calls = asyncio.Semaphore(max_concurrency)
+        self._vectors = {}
+        self.errors = 0
+
+    def _write(self, row, answer=None, error=None, **timings):
+        self.errors += error is not None
+        record = {**row, "answer": answer, "error": error, "timings": timings}
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.out.flush()
+
+    async def embed_questions(self, rows):
+        """Embed every distinct question in one call, outside the document embedding cache."""
+        from tools.embeddings import get_query_embeddings
+        questions = list(dict.fromkeys(row["question"] for row in rows))
+        with timed("batch.embed", questions=len(questions)):
+            vectors = await asyncio.to_thread(get_query_embeddings().embed_documents, questions)
+        self._vectors = dict(zip(questions, vectors))
+
+    async def _answer(self, agent, row, documents, **timings):
+        async with self._llm_calls:
+            started = time.perf_counter()
+            try:
+                if documents is not None:
+                    answer = await agent.aanswer_from_documents(row["question"], documents)
+                else:
+                    answer = await aanswer(agent, {"input": row["question"], "conversation_history": []})
+            except Exception as e:
+                self._write(row, error=str(e), answer_ms=_ms(time.perf_counter() - started), **timings)
+                return
+        self._write(row, answer=answer, answer_ms=_ms(time.perf_counter() - started), **timings)
+
+    async def answer_group(self, agent, rows, index_ms):
+        # The cache wrapper only matters for interactive sessions
+        agent = getattr(agent, "inner", agent)
+        retriever = getattr(agent, "retriever", None)
+        if not (hasattr(agent, "aanswer_from_documents") and hasattr(retriever, "retrieve_by_vectors")):
+            # Agent mode: the agent decides when to retrieve, so rows run one call each
+            await asyncio.gather(*(self._answer(agent, row, None, index_ms=index_ms, retrieve_ms=None)
+                                   for row in rows))
+            return
+
+        questions = [row["question"] for row in rows]
+        started = time.perf_counter()
+        try:
+            documents = await asyncio.to_thread(
+                retriever.retrieve_by_vectors, questions, [self._vectors[question] for question in questions]
+            )
+        except Exception as e:
+            for row in rows:
+                self._write(row, error=f"Error retrieving: {e}", index_ms=index_ms)
+            return
+        retrieve_ms = _ms(time.perf_counter() - started)
+        await asyncio.gather(*(self._answer(agent, row, docs, index_ms=index_ms, retrieve_ms=retrieve_ms)
+                               for row, docs in zip(rows, documents)))
+
+    async def run(self, rows):
+        await self.embed_questions(rows)
+        pending = []
+        for group in group_rows(rows):
+            started = time.perf_counter()
+            try:
+                agent = await abuild_graph_and_agent(group[0]["urls"])
+            except Exception as e:
+                for row in group:
+                    self._write(row, error=str(e))
+                continue
+            pending.append(asyncio.ensure_future(
+                self.answer_group(agent, group, _ms(time.perf_counter() - started))
+            ))
+        await asyncio.gather(*pending)
+        count_items("batch", len(rows))
+
+
+async def run(input_path, output_path, max_concurrency=None):
+    rows = read_rows(input_path)
+    started = time.perf_counter()
+    with open(output_path, "w", encoding="utf-8") as out:
+        runner = BatchRunner(out, max_concurrency)
+        await runner.run(rows)
+    elapsed = time.perf_counter() - started
+    print(f"Answered {len(rows)} questions over {len(group_rows(rows))} video sets in {elapsed:.1f}s "
+          f"({runner.errors} errors) -> {output_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions about YouTube videos.")
+    parser.add_argument("input", help="JSONL rows with 'urls', 'question' and an optional 'id'")
+    parser.add_argument("output", help="JSONL file to write answers and timings to")
+    parser.add_argument("--concurrency", type=int, help="LLM calls in flight (default: batch.max_concurrency)")
+    args = parser.parse_args()
+    asyncio.run(run(args.input, args.output, args.concurrency))
@@ -0,0 +1,94 @@
+"""Cold-start import benchmark.
+
+Imports each entry module in a fresh interpreter under ``-X importtime`` and
+reports the cumulative import time, the slowest imports and any heavy
+backend (LangGraph, LangChain agents, OpenAI, Chroma, ...) pulled in at
+import time. Exits non-zero when a module is over budget or imports a heavy
+backend eagerly, so it can run as a regression check:
+
+    python benchmarks/importtime.py --budget-ms 400
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["main", "service", "server"]
+
+# Backends that must only be imported on first use
+HEAVY_MODULES = [
+    "langgraph",
+    "langchain.agents",
+    "langchain.chains",
+    "langchain_openai",
+    "langchain_groq",
+    "langchain_community.vectorstores",
+    "chromadb",
+    "openai",
+    "sentence_transformers",
+    "youtube_transcript_api",
+]
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(module):
+    """Return ``[(module, cumulative_us, depth)]`` for one cold import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    profile = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            profile.append((match.group(4), int(match.group(2)), len(match.group(3))))
+    return profile
+
+
+def measure(module, repeats):
+    """Best-of-``repeats`` cumulative import time (ms) and the matching profile."""
+    best_ms, best_profile = None, None
+    for _ in range(repeats):
+        profile = import_profile(module)
+        total_ms = next(cumulative for name, cumulative, _ in profile if name == module) / 1000
+        if best_ms is None or total_ms < best_ms:
+            best_ms, best_profile = total_ms, profile
+    return best_ms, best_profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the entry modules.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=400,
+                        help="fail if any module takes longer than this to import")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        total_ms, profile = measure(module, args.repeats)
+        status = "ok" if total_ms <= args.budget_ms else "OVER BUDGET"
+        print(f"{module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms) {status}")
+
+        slowest = sorted((entry for entry in profile if entry[0] != module), key=lambda entry: -entry[1])
+        for name, cumulative, _ in slowest[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+        imported = {name for name, _, _ in profile}
+        eager = [heavy for heavy in HEAVY_MODULES if heavy in imported]
+        if eager:
+            print(f"  imported eagerly: {', '.join(eager)}")
+        failed = failed or total_ms > args.budget_ms or bool(eager)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
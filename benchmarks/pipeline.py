@@ -0,0 +1,218 @@
+"""Offline benchmark of the ingest, retrieval and QA pipeline.
+
+Runs the real graph (fetch, chunk, embed, index, agent) against local
+stand-ins so nothing leaves the machine:
+
+* transcripts: every synthetic video is seeded into a private transcript
+  store from ``transcript_cache.json``, so fetches are cache hits;
+* embeddings: the deterministic ``fake`` provider;
+* LLM: the ``fake`` provider, streaming a canned answer over
+  ``--llm-latency-ms``.
+
+Reports throughput and p50/p95/p99 latency per stage for each combination
+of video count and concurrency:
+
+    python benchmarks/pipeline.py --videos 1 5 20 --concurrency 1 4 16
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from config import set_setting
+
+STUB_ANSWER = "This is a stub answer from the video content."
+
+
+def configure(workdir, llm_latency_ms, embedding_size):
+    """Point every backend and cache at local stand-ins under ``workdir``."""
+    settings = {
+        "embeddings.provider": "fake",
+        "embeddings.model": f"bench-fake-{embedding_size}",
+        "embeddings.fake_size": embedding_size,
+        "cache.embeddings_dir": os.path.join(workdir, "cache", "embeddings"),
+        "cache.chunks_dir": os.path.join(workdir, "cache", "chunks"),
+        "cache.dedup_dir": os.path.join(workdir, "cache", "dedup"),
+        "vector_store.markers_path": os.path.join(workdir, "cache", "indexed_videos.sqlite3"),
+        "cache.transcripts_dir": os.path.join(workdir, "transcripts"),
+        "answer_cache.enabled": False,
+        "qa.mode": "direct",
+        "qa.llm_provider": "fake",
+        "llm.stub_answer": STUB_ANSWER,
+        "llm.stub_latency": llm_latency_ms / 1000.0 / len(STUB_ANSWER) if llm_latency_ms else None,
+    }
+    for key, value in settings.items():
+        set_setting(key, value)
+
+
+class FakeTranscriptSource:
+    """Hand out synthetic videos whose transcripts come from a legacy cache file.
+
+    Each video reuses one of the cached transcripts, tagged with its own id
+    so chunks and embeddings are never shared between videos.
+    """
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            self.transcripts = [lines for lines in json.load(f).values() if lines]
+        if not self.transcripts:
+            raise ValueError(f"No transcripts found in {path}")
+        self.count = 0
+
+    def new_videos(self, n):
+        """Seed ``n`` fresh videos into the transcript store and return their urls."""
+        from tools.transcript_store import get_transcript_store
+        store = get_transcript_store()
+        urls = []
+        for _ in range(n):
+            video_id = f"bench{self.count:06d}"
+            lines = self.transcripts[self.count % len(self.transcripts)]
+            segments = [
+                {"text": f"{text} [{video_id}]", "start": 2.0 * i, "duration": 2.0}
+                for i, text in enumerate(lines)
+            ]
+            store.put(video_id, segments)
+            urls.append(f"https://www.youtube.com/watch?v={video_id}")
+            self.count += 1
+        return urls
+
+    def questions(self, n, seed=0):
+        """Sample ``n`` questions from transcript lines."""
+        rng = np.random.default_rng(seed)
+        lines = [line for lines in self.transcripts for line in lines if len(line.split()) > 4]
+        return [f"What does the video say about {lines[i]}?" for i in rng.integers(0, len(lines), n)]
+
+
+def summarize(stage, videos, concurrency, latencies, elapsed, units=None):
+    latencies_ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "stage": stage,
+        "videos": videos,
+        "concurrency": concurrency,
+        "ops": len(latencies),
+        "throughput": (units if units is not None else len(latencies)) / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+def run_concurrently(fn, items, concurrency):
+    """Call ``fn`` on every item with ``concurrency`` threads; return (latencies, elapsed, results)."""
+    def timed(item):
+        started = time.perf_counter()
+        result = fn(item)
+        return time.perf_counter() - started, result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, items))
+    elapsed = time.perf_counter() - started
+    return [latency for latency, _ in outcomes], elapsed, [result for _, result in outcomes]
+
+
+def bench_ingest(source, videos, concurrency, repeats):
+    """Build agents for fresh video sets; throughput is in videos per second."""
+    from main import build_graph_and_agent
+    batches = [source.new_videos(videos) for _ in range(max(repeats, concurrency))]
+    latencies, elapsed, _ = run_concurrently(build_graph_and_agent, batches, concurrency)
+    return summarize("ingest", videos, concurrency, latencies, elapsed, units=videos * len(batches))
+
+
+def bench_retrieval(urls, questions, concurrency):
+    from tools.chromadb_tool import CORPUS_COLLECTION, get_retriever, get_vector_store
+    from tools.context_budget import BudgetedRetriever, context_budget
+    from tools.utils import extract_video_id
+    retriever = BudgetedRetriever(
+        retriever=get_retriever(get_vector_store(CORPUS_COLLECTION), [extract_video_id(url) for url in urls]),
+        max_tokens=context_budget(),
+    )
+    latencies, elapsed, _ = run_concurrently(retriever.invoke, questions, concurrency)
+    return summarize("retrieval", len(urls), concurrency, latencies, elapsed)
+
+
+def bench_ask(urls, questions, concurrency):
+    from main import build_graph_and_agent, stream_answer
+    agent = build_graph_and_agent(urls)
+
+    def ask(question):
+        return "".join(stream_answer(agent, {"input": question, "conversation_history": []}))
+
+    latencies, elapsed, _ = run_concurrently(ask, questions, concurrency)
+    return summarize("ask", len(urls), concurrency, latencies, elapsed)
+
+
+def print_table(rows, out):
+    header = f"{'stage':<10} {'videos':>6} {'conc':>5} {'ops':>5} {'thrpt/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for row in rows:
+        print(f"{row['stage']:<10} {row['videos']:>6} {row['concurrency']:>5} {row['ops']:>5} "
+              f"{row['throughput']:>9.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}",
+              file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest, retrieval and QA on local stand-ins.")
+    parser.add_argument("--videos", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--questions", type=int, default=64, help="questions per retrieval/ask run")
+    parser.add_argument("--repeats", type=int, default=3, help="ingests per video count and concurrency")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="simulated time to stream one answer")
+    parser.add_argument("--embedding-size", type=int, default=384)
+    parser.add_argument("--source", default=os.path.join(ROOT, "transcript_cache.json"),
+                        help="legacy transcript cache used as the transcript source")
+    parser.add_argument("--workdir", help="directory for indexes and caches (default: a temp dir)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    args = parser.parse_args()
+
+    source = FakeTranscriptSource(args.source)
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="qa-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    # Chroma persists under ./db, so run from the work directory
+    os.chdir(workdir)
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    configure(workdir, args.llm_latency_ms, args.embedding_size)
+
+    out = sys.stdout
+    print(f"Benchmarking in {workdir}", file=out)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    rows = []
+    with quiet:
+        import main as pipeline
+        # Keep the environment quiet and offline whatever main sets at import
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"
+        pipeline.get_llm.cache_clear()
+        # Warm up: open the vector store and compile the graph outside the timings
+        pipeline.build_graph_and_agent(source.new_videos(1))
+
+        for videos in args.videos:
+            for concurrency in args.concurrency:
+                rows.append(bench_ingest(source, videos, concurrency, args.repeats))
+            urls = source.new_videos(videos)
+            pipeline.build_graph_and_agent(urls)
+            questions = source.questions(args.questions, seed=videos)
+            for concurrency in args.concurrency:
+                rows.append(bench_retrieval(urls, questions, concurrency))
+            for concurrency in args.concurrency:
+                rows.append(bench_ask(urls, questions, concurrency))
+
+    print_table(rows, out)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
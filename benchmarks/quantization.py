@@ -0,0 +1,123 @@
+"""Recall-vs-memory benchmark for the quantized NumPy vector store.
+
+Builds one synthetic clustered corpus (unit vectors around random centres,
+like chunk embeddings of a few hundred videos), indexes it with each
+``vector_store.quantization`` mode and compares them with exact float32
+search:
+
+* resident MB: vector data searched in memory (float32 rows are memory
+  mapped from disk in the quantized modes and only read to rescore);
+* disk MB: everything the store writes;
+* recall@k: overlap of the top k with the exact float32 top k;
+* p50/p95 ms: single-query search latency (float16 trails float32 here:
+  NumPy has no fast float16 matrix product, so its codes are upcast per search).
+
+    python benchmarks/quantization.py --rows 100000 --dim 384 --rescore 1 4 8
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from tools.numpy_store import NumpyVectorStore, top_k
+
+# Rows per upsert while building the index
+INSERT_BATCH = 20000
+
+
+def synthetic_corpus(rows, dim, clusters, spread, seed):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, rows)
+    vectors = centres[assignment] + spread * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(corpus, n, noise, seed):
+    """Perturbed corpus points, so every query has close neighbours."""
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.integers(0, len(corpus), n)]
+    queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_neighbours(corpus, queries, k):
+    scores = corpus @ queries.T
+    return [set(top_k(scores[:, column], k).tolist()) for column in range(len(queries))]
+
+
+def directory_mb(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2 ** 20
+
+
+def build_store(corpus, directory, quantization, rescore_factor):
+    store = NumpyVectorStore("bench", embedding=None, directory=directory,
+                             quantization=quantization, rescore_factor=rescore_factor)
+    for start in range(0, len(corpus), INSERT_BATCH):
+        batch = corpus[start:start + INSERT_BATCH]
+        ids = [str(row) for row in range(start, start + len(batch))]
+        store.upsert_vectors(ids, batch, [""] * len(batch), [{"video_id": f"v{row % 500}"} for row in range(start, start + len(batch))])
+    # Reopen, so the float32 rows are memory-mapped the way a restarted service sees them
+    return NumpyVectorStore("bench", embedding=None, directory=directory,
+                            quantization=quantization, rescore_factor=rescore_factor)
+
+
+def run(store, queries, truth, k):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        hits = store.similarity_search_by_vectors([query], k)[0]
+        latencies.append(time.perf_counter() - started)
+        found = {int(document.id) for document, _ in hits}
+        recalls.append(len(found & expected) / len(expected))
+    p50, p95 = np.percentile(np.asarray(latencies) * 1000, [50, 95])
+    return float(np.mean(recalls)), float(p50), float(p95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall and memory of float32, float16 and int8 storage.")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=0.35, help="noise around each cluster centre")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-noise", type=float, default=0.05)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=["float32", "float16", "int8"])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 4],
+                        help="rescore factors to try for the quantized modes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.rows, args.dim, args.clusters, args.spread, args.seed)
+    queries = make_queries(corpus, args.queries, args.query_noise, args.seed + 1)
+    truth = exact_neighbours(corpus, queries, args.k)
+
+    header = f"{'mode':<8} {'rescore':>7} {'resident MB':>11} {'disk MB':>8} {f'recall@{args.k}':>9} {'p50 ms':>7} {'p95 ms':>7}"
+    print(f"{args.rows} vectors x {args.dim} dims, {args.queries} queries")
+    print(header)
+    print("-" * len(header))
+    workdir = tempfile.mkdtemp(prefix="qa-quant-")
+    try:
+        for mode in args.modes:
+            for rescore_factor in ([1] if mode == "float32" else args.rescore):
+                directory = os.path.join(workdir, f"{mode}-{rescore_factor}")
+                store = build_store(corpus, directory, mode, rescore_factor)
+                recall, p50, p95 = run(store, queries, truth, args.k)
+                print(f"{mode:<8} {rescore_factor if mode != 'float32' else '-':>7} "
+                      f"{store.resident_bytes() / 2 ** 20:>11.1f} {directory_mb(directory):>8.1f} "
+                      f"{recall:>9.3f} {p50:>7.2f} {p95:>7.2f}")
+                shutil.rmtree(directory)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
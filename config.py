@@ -1,8 +1,51 @@
 from dotenv import load_dotenv
+from functools import lru_cache
+import hashlib
+import json
 import os
 
+import yaml
+
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")
 LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT")
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+
+
+@lru_cache(maxsize=None)
+def load_config(path=CONFIG_FILE):
+    """Load config.yaml once per process; a missing file means all defaults."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+# Runtime overrides (e.g. from command-line flags), checked before config.yaml
+_overrides = {}
+
+
+def set_setting(key, value):
+    """Override a dotted config key for the rest of this process."""
+    _overrides[key] = value
+
+
+def config_fingerprint():
+    """Hash of the effective configuration, for keying cached resources."""
+    effective = {"file": load_config(), "overrides": _overrides}
+    return hashlib.sha256(json.dumps(effective, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def get_setting(key, default=None):
+    """Look up a dotted key such as ``retrieval.k`` in config.yaml."""
+    if key in _overrides:
+        return _overrides[key]
+    value = load_config()
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
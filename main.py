@@ -1,16 +1,22 @@
-# Update imports to include OpenAI
-from langgraph.graph import StateGraph
-from tools.youtube_tool import get_youtube_transcript
-from tools.chromadb_tool import store_embeddings
+# Heavy LangChain/LangGraph/OpenAI modules are imported where first used, keeping startup fast
+from tools.youtube_tool import afetch_transcripts, fetch_transcripts
+from tools.chunking import chunk_transcript
+from tools.chunk_store import current_chunking, get_chunk_store
+from tools.chromadb_tool import (
+    CORPUS_COLLECTION, astore_embeddings, get_retriever, indexed_video_ids, mark_videos_indexed, store_embeddings
+)
+from tools.utils import extract_video_id
+from tools.answer_cache import CachedVideoQA, get_answer_cache
+from tools.metrics import count_cache, count_items, timed
+from config import config_fingerprint, get_setting
 import os
 from dotenv import load_dotenv
-from langchain_core.documents import Document
 from typing import Dict, Any, TypedDict
-from langchain.agents import AgentExecutor
-from langchain.agents import create_openai_functions_agent
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.tools import Tool
-from langchain.chains import RetrievalQA
+from collections import OrderedDict
+from functools import lru_cache
+import asyncio
+import threading
+import time
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,24 +27,46 @@ LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
-# Set environment variables
-os.environ["LANGCHAIN_API_KEY"] = LANGCHAIN_API_KEY
-os.environ["LANGCHAIN_PROJECT"] = LANGCHAIN_PROJECT
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
-os.environ["YOUTUBE_API_KEY"] = YOUTUBE_API_KEY
-
-# Import OpenAI
-from langchain_openai import ChatOpenAI
+# Set environment variables (skipping unset keys, e.g. when running on stub backends)
+for name, value in {
+    "LANGCHAIN_API_KEY": LANGCHAIN_API_KEY,
+    "LANGCHAIN_PROJECT": LANGCHAIN_PROJECT,
+    "OPENAI_API_KEY": OPENAI_API_KEY,
+    "YOUTUBE_API_KEY": YOUTUBE_API_KEY,
+}.items():
+    if value is not None:
+        os.environ[name] = value
+# LangSmith tracing is opt-in: set LANGCHAIN_TRACING_V2=true in .env to enable it.
+# Local per-stage timings and counters live in tools.metrics.
 
+@lru_cache(maxsize=None)
 def get_llm(provider="groq"):
-    """Return an LLM instance based on the selected provider."""
+    """Return an LLM instance based on the selected provider, built once per process.
+
+    Every instance reports call timings and token counts to ``tools.metrics``.
+    """
+    from tools.llm_metrics import LLMMetricsHandler
+    llm = _build_llm(provider)
+    llm.callbacks = [LLMMetricsHandler(getattr(llm, "model_name", None) or provider)]
+    return llm
+
+def _build_llm(provider):
+    if provider == "fake":
+        # Canned answers for offline load tests
+        from tools.stub_llm import StubChatModel
+        return StubChatModel(
+            responses=[get_setting("llm.stub_answer", "This is a stub answer from the video content.")],
+            # Simulated generation time, in seconds per answer character, streamed or not
+            sleep=get_setting("llm.stub_latency")
+        )
     if provider == "groq":
+        from langchain_groq import ChatGroq
         return ChatGroq(
             api_key=os.getenv("GROQ_API_KEY"),
             model_name="llama3-8b-8192"  # You can change to "mixtral-8x7b-32768" if needed
         )
     else:
+        from langchain_openai import ChatOpenAI
         return ChatOpenAI(
             temperature=0,
             model="gpt-4-turbo-preview",
@@ -50,86 +78,230 @@ def get_llm(provider="groq"):
 class GraphState(TypedDict, total=False):
     """State for the video processing graph."""
     urls: list
+    video_ids: list  # Videos this session searches over in the corpus index
     all_chunks: list
     vector_store: Any
     agent: Any
     conversation_history: list  # Store conversation history
 
+# Create an even more restrictive system prompt
+AGENT_SYSTEM_PROMPT = """You are a specialized assistant that ONLY answers questions based on the transcripts of provided YouTube videos.
+
+CRITICAL RULES YOU MUST FOLLOW:
+1. You have NO knowledge beyond what is in the video transcripts.
+2. You can ONLY provide information that is EXPLICITLY mentioned in the video transcripts.
+3. If the information is not in the transcripts, you MUST respond with EXACTLY: "I don't have that information in the video content."
+4. You MUST use the video_transcript_qa tool for EVERY question without exception.
+5. NEVER make up information or use general knowledge.
+6. If asked about topics unrelated to the videos, respond with EXACTLY: "I can only answer questions about the content of the provided videos."
+7. Do not reference external sources, websites, or any information not in the videos.
+8. Do not offer opinions or interpretations beyond what is directly stated in the videos.
+
+Your ONLY purpose is to retrieve and provide information from the video transcripts."""
+
+@lru_cache(maxsize=1)
+def get_agent_prompt():
+    """Return the agent prompt, built once per process."""
+    from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+    return ChatPromptTemplate.from_messages([
+        ("system", AGENT_SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="conversation_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+
+@lru_cache(maxsize=1)
+def get_qa_combine_chain():
+    """Return the "stuff" QA chain shared by every session's RetrievalQA."""
+    from langchain.chains.question_answering import load_qa_chain
+    return load_qa_chain(get_llm(get_setting("qa.llm_provider", "openai")), chain_type="stuff", verbose=True)
+
 def get_user_query():
     """Function to prompt the user for input."""
     print("\nPlease enter your query about the videos (type 'exit' to quit):")
     query = input("Query: ")
     return query
 
+def _fetch_settings():
+    return dict(
+        max_workers=get_setting("ingest.max_workers", 8),
+        timeout=get_setting("ingest.fetch_timeout", 30),
+        retries=get_setting("ingest.fetch_retries", 2),
+        backoff=get_setting("ingest.retry_backoff", 1.0),
+    )
+
+def _split_indexed(urls):
+    """Map urls to video ids and find the videos already in the corpus index."""
+    video_id_by_url = {url: extract_video_id(url) or url for url in urls}
+    indexed = indexed_video_ids(set(video_id_by_url.values()))
+    video_ids = []
+    for url in urls:
+        if video_id_by_url[url] in indexed:
+            print(f"Video already indexed: {url}")
+            video_ids.append(video_id_by_url[url])
+    to_fetch = [url for url in urls if video_id_by_url[url] not in indexed]
+    return video_id_by_url, video_ids, to_fetch
+
+def _load_stored_chunks(urls, video_id_by_url, video_ids):
+    """Take chunks for already-chunked videos from the chunk store.
+
+    Returns the stored chunks and the urls that still need fetching.
+    """
+    from langchain_core.documents import Document
+    store, chunking = get_chunk_store(), current_chunking()
+    all_chunks, to_fetch = [], []
+    for url in urls:
+        chunks = store.get(video_id_by_url[url], chunking)
+        count_cache("chunks", bool(chunks))
+        if not chunks:
+            to_fetch.append(url)
+            continue
+        all_chunks.extend(Document(**chunk) for chunk in chunks)
+        video_ids.append(video_id_by_url[url])
+        print(f"Loaded stored chunks for video: {url}")
+    return all_chunks, to_fetch
+
+def _chunk_fetched(fetched, video_id_by_url, video_ids):
+    """Chunk fetched transcripts, recording each video that produced chunks."""
+    from langchain_core.documents import Document
+    store, chunking = get_chunk_store(), current_chunking()
+    all_chunks = []
+    with timed("chunk", videos=len(fetched)) as fields:
+        for url, transcript, error in fetched:
+            if error is not None:
+                print(f"Error processing video {url}: {error}")
+                print("Continuing with other videos...")
+                continue
+            
+            # Create token-bounded, timestamped chunks from the transcript
+            chunks = chunk_transcript(url, transcript)
+            store.put(video_id_by_url[url], url, chunks, chunking)
+            for chunk in chunks:
+                all_chunks.append(Document(**chunk))
+            if chunks:
+                video_ids.append(video_id_by_url[url])
+            
+            print(f"Successfully processed video: {url}")
+        fields["chunks"] = len(all_chunks)
+    count_items("chunk", len(all_chunks))
+    return all_chunks
+
 def process_videos_node(state: Dict) -> Dict:
     """Node to process multiple videos and combine their transcripts."""
-    print(f"State at start of process_videos_node: {state}")  # Debugging line
-    
     # Ensure that the 'urls' field is correctly passed
     urls = state.get("urls", [])
     if not urls:
         raise ValueError("No URLs found in state.")
     
-    all_chunks = []
+    # Videos already in the corpus index need no fetching, chunking or embedding
+    video_id_by_url, video_ids, to_fetch = _split_indexed(urls)
     
-    for url in urls:
-        try:
-            print(f"Processing video: {url}")
-            transcript = get_youtube_transcript(url)
-            
-            # Create chunks from transcript
-            for i in range(0, len(transcript), 100):
-                chunk_text = " ".join(transcript[i:i+100])
-                all_chunks.append(Document(
-                    page_content=chunk_text,
-                    metadata={"source": url}
-                ))
-            
-            print(f"Successfully processed video: {url}")
-        except Exception as e:
-            print(f"Error processing video {url}: {e}")
-            print("Continuing with other videos...")
+    # Videos chunked before come straight from the chunk store
+    all_chunks, to_fetch = _load_stored_chunks(to_fetch, video_id_by_url, video_ids)
+    
+    # Fetch every other transcript concurrently; results come back in url order
+    with timed("fetch", videos=len(to_fetch)):
+        fetched = fetch_transcripts(to_fetch, **_fetch_settings())
+    count_items("fetch", len(to_fetch))
+    all_chunks += _chunk_fetched(fetched, video_id_by_url, video_ids)
     
     # Create a new state dictionary instead of modifying the existing one
-    return {"urls": urls, "all_chunks": all_chunks}
+    return {"urls": urls, "video_ids": video_ids, "all_chunks": all_chunks}
+
+async def aprocess_videos_node(state: Dict) -> Dict:
+    """Async variant of ``process_videos_node``."""
+    urls = state.get("urls", [])
+    if not urls:
+        raise ValueError("No URLs found in state.")
+    
+    video_id_by_url, video_ids, to_fetch = await asyncio.to_thread(_split_indexed, urls)
+    all_chunks, to_fetch = await asyncio.to_thread(_load_stored_chunks, to_fetch, video_id_by_url, video_ids)
+    with timed("fetch", videos=len(to_fetch)):
+        fetched = await afetch_transcripts(to_fetch, **_fetch_settings())
+    count_items("fetch", len(to_fetch))
+    all_chunks += await asyncio.to_thread(_chunk_fetched, fetched, video_id_by_url, video_ids)
+    
+    return {"urls": urls, "video_ids": video_ids, "all_chunks": all_chunks}
+
+def dedupe_chunks_node(state: Dict) -> Dict:
+    """Node to drop near-duplicate chunks, within the video set and against earlier ingests, before embedding."""
+    from tools.dedup import deduplicate
+    
+    all_chunks = state.get("all_chunks", [])
+    with timed("dedup", chunks=len(all_chunks)) as fields:
+        kept, dropped = deduplicate(all_chunks)
+        fields["dropped"] = dropped
+    count_items("dedup_dropped", dropped)
+    if dropped:
+        print(f"Dropped {dropped} near-duplicate chunks of {len(all_chunks)}")
+    
+    # Kept chunks carry the dropped chunks' sources and videos in their metadata
+    return {**state, "all_chunks": kept}
 
 def store_embeddings_node(state: Dict) -> Dict:
     """Node to store embeddings in ChromaDB."""
-    print(f"State at start of store_embeddings_node: {state}")  # Debugging line
-    
     all_chunks = state.get("all_chunks", [])
-    if not all_chunks:
+    if not all_chunks and not state.get("video_ids"):
         raise ValueError("No valid chunks found from any videos")
     
-    # Store embeddings in ChromaDB
-    collection_name = "multiple_videos_collection"
-    vector_store = store_embeddings(all_chunks, collection_name=collection_name)
+    # Add any new chunks to the shared corpus index; sessions never wipe it
+    vector_store = store_embeddings(all_chunks, collection_name=CORPUS_COLLECTION)
+    # Only now are these videos complete; an interrupted add gets redone next time
+    mark_videos_indexed(state.get("video_ids", []), collection_name=CORPUS_COLLECTION)
     
     # Create a new state dictionary with all previous keys plus the new one
     return {**state, "vector_store": vector_store}
 
+async def astore_embeddings_node(state: Dict) -> Dict:
+    """Async variant of ``store_embeddings_node``."""
+    all_chunks = state.get("all_chunks", [])
+    if not all_chunks and not state.get("video_ids"):
+        raise ValueError("No valid chunks found from any videos")
+    
+    vector_store = await astore_embeddings(all_chunks, collection_name=CORPUS_COLLECTION)
+    await asyncio.to_thread(mark_videos_indexed, state.get("video_ids", []), CORPUS_COLLECTION)
+    return {**state, "vector_store": vector_store}
+
+def with_answer_cache(agent, llm, video_ids):
+    """Serve repeated questions about these videos from the answer cache, if enabled."""
+    if not get_setting("answer_cache.enabled", True):
+        return agent
+    model_name = getattr(llm, "model_name", None) or type(llm).__name__
+    return CachedVideoQA(agent, get_answer_cache(), video_ids, model_name)
+
 def create_agent_node(state: Dict) -> Dict:
     """Node to create QA agent with vector store."""
-    print(f"State at start of create_agent_node: {state}")  # Debugging line
+    from tools.context_budget import BudgetedRetriever, context_budget
     
     vector_store = state.get("vector_store")
     if not vector_store:
         raise ValueError("No vector store found in state.")
+    video_ids = state.get("video_ids")
+    if not video_ids:
+        raise ValueError("No indexed videos found in state.")
     
-    # Use OpenAI instead of Groq for more powerful processing
-    llm = ChatOpenAI(
-        temperature=0,
-        model="gpt-4-turbo-preview",
-        max_tokens=1024
-    )
+    # Use OpenAI instead of Groq for more powerful processing; the model is
+    # shared across sessions, only the retriever is per session
+    llm = get_llm(get_setting("qa.llm_provider", "openai"))
+    
+    # Hybrid BM25 + vector retriever, searching only this session's videos
+    retriever = get_retriever(vector_store, video_ids)
+    # Dedupe, merge and trim the retrieved chunks to this model's context budget
+    retriever = BudgetedRetriever(retriever=retriever, max_tokens=context_budget(getattr(llm, "model_name", None)))
     
-    # Increase k to get more context from the videos
-    retriever = vector_store.as_retriever(search_kwargs={"k": 8})
+    # Direct mode: one retrieval plus one grounded LLM call, no agent loop
+    if get_setting("qa.mode", "agent") == "direct":
+        from agents.direct_qa import DirectVideoQA
+        return {**state, "agent": with_answer_cache(DirectVideoQA(llm, retriever), llm, video_ids), "conversation_history": []}
     
-    # Create a more restrictive QA chain
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain.chains import RetrievalQA
+    from langchain.tools import Tool
+    from agents.direct_qa import ERROR_ANSWER
+    
+    # Create a more restrictive QA chain by binding the shared chain to our retriever
+    qa_chain = RetrievalQA(
+        combine_documents_chain=get_qa_combine_chain(),
         retriever=retriever,
         return_source_documents=True,
         verbose=True
@@ -148,7 +320,7 @@ def create_agent_node(state: Dict) -> Dict:
             return result["result"]
         except Exception as e:
             print(f"Error in QA tool: {e}")
-            return "I couldn't find specific information about that in the video content."
+            return ERROR_ANSWER
     
     # Create a more restrictive tool
     retrieval_tool = Tool(
@@ -159,30 +331,9 @@ def create_agent_node(state: Dict) -> Dict:
     
     tools = [retrieval_tool]
     
-    # Create an even more restrictive system prompt
-    system_prompt = """You are a specialized assistant that ONLY answers questions based on the transcripts of provided YouTube videos.
-
-CRITICAL RULES YOU MUST FOLLOW:
-1. You have NO knowledge beyond what is in the video transcripts.
-2. You can ONLY provide information that is EXPLICITLY mentioned in the video transcripts.
-3. If the information is not in the transcripts, you MUST respond with EXACTLY: "I don't have that information in the video content."
-4. You MUST use the video_transcript_qa tool for EVERY question without exception.
-5. NEVER make up information or use general knowledge.
-6. If asked about topics unrelated to the videos, respond with EXACTLY: "I can only answer questions about the content of the provided videos."
-7. Do not reference external sources, websites, or any information not in the videos.
-8. Do not offer opinions or interpretations beyond what is directly stated in the videos.
-
-Your ONLY purpose is to retrieve and provide information from the video transcripts."""
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        MessagesPlaceholder(variable_name="conversation_history", optional=True),
-        ("human", "{input}"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
     
     # Use OpenAI functions agent instead of the custom SimpleQAAgent
-    agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
+    agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=get_agent_prompt())
     agent_executor = AgentExecutor(
         agent=agent, 
         tools=tools, 
@@ -190,43 +341,217 @@ Your ONLY purpose is to retrieve and provide information from the video transcri
         handle_parsing_errors=True,
         max_iterations=3,
         early_stopping_method="generate",
-        return_intermediate_steps=False
+        # Lets the answer cache tell cut-off runs and tool failures from real answers
+        return_intermediate_steps=True
     )
     
     # Create a new state dictionary with all previous keys plus the new one
-    return {**state, "agent": agent_executor, "conversation_history": []}
+    return {**state, "agent": with_answer_cache(agent_executor, llm, video_ids), "conversation_history": []}
+
+def _timed_node(name, node):
+    """Wrap a graph node so each run is recorded under the ``node.<name>`` stage."""
+    if asyncio.iscoroutinefunction(node):
+        async def run(state):
+            with timed(f"node.{name}"):
+                return await node(state)
+    else:
+        def run(state):
+            with timed(f"node.{name}"):
+                return node(state)
+    return run
+
+@lru_cache(maxsize=1)
+def get_compiled_graph():
+    """Build and compile the video QA graph once per process."""
+    from langgraph.graph import StateGraph
+    
+    # Create LangGraph builder with state schema
+    builder = StateGraph(GraphState)
+    
+    # Add nodes
+    builder.add_node("process_videos", _timed_node("process_videos", process_videos_node))
+    builder.add_node("dedupe_chunks", _timed_node("dedupe_chunks", dedupe_chunks_node))
+    builder.add_node("store_embeddings", _timed_node("store_embeddings", store_embeddings_node))
+    builder.add_node("create_agent", _timed_node("create_agent", create_agent_node))
+    
+    # Connect nodes
+    builder.set_entry_point("process_videos")
+    builder.add_edge("process_videos", "dedupe_chunks")
+    builder.add_edge("dedupe_chunks", "store_embeddings")
+    builder.add_edge("store_embeddings", "create_agent")
+    
+    # Compile the graph
+    return builder.compile()
+
+# Agents are stateless between questions (history is passed per call), so
+# sessions over the same videos share one, keyed by config and video set
+MAX_CACHED_AGENTS = 32
+_agent_cache = OrderedDict()
+_agent_cache_lock = threading.Lock()
+
+def _agent_cache_key(video_ids):
+    return (config_fingerprint(), tuple(sorted(set(video_ids))))
+
+def _cached_agent(urls):
+    key = _agent_cache_key(extract_video_id(url) or url for url in urls)
+    with _agent_cache_lock:
+        entry = _agent_cache.get(key)
+        if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+            _agent_cache.move_to_end(key)
+            count_cache("agent", True)
+            return entry[0]
+        _agent_cache.pop(key, None)
+    count_cache("agent", False)
+    return None
+
+def _cache_agent(urls, final_state):
+    """Cache the agent under the videos that made it into the index and under the requested ones.
+    
+    When some requested videos failed, the requested-set entry expires after
+    ``agent_cache.partial_ttl`` seconds, so repeat calls don't re-fetch the
+    failing videos on every request but still retry them eventually.
+    """
+    indexed_key = _agent_cache_key(final_state["video_ids"])
+    requested_key = _agent_cache_key(extract_video_id(url) or url for url in urls)
+    with _agent_cache_lock:
+        _agent_cache[indexed_key] = (final_state["agent"], None)
+        if requested_key != indexed_key:
+            expires = time.monotonic() + get_setting("agent_cache.partial_ttl", 300)
+            _agent_cache[requested_key] = (final_state["agent"], expires)
+        while len(_agent_cache) > MAX_CACHED_AGENTS:
+            _agent_cache.popitem(last=False)
 
 def build_graph_and_agent(urls):
     """Build the graph and agent for the Streamlit app."""
     try:
-        # Create LangGraph builder with state schema
-        builder = StateGraph(GraphState)
-        
-        # Add nodes
-        builder.add_node("process_videos", process_videos_node)
-        builder.add_node("store_embeddings", store_embeddings_node)
-        builder.add_node("create_agent", create_agent_node)
-        
-        # Connect nodes
-        builder.set_entry_point("process_videos")
-        builder.add_edge("process_videos", "store_embeddings")
-        builder.add_edge("store_embeddings", "create_agent")
-        
-        # Compile the graph
-        graph = builder.compile()
+        # Reuse the agent if this exact video set was built before
+        qa_agent = _cached_agent(urls)
+        if qa_agent is not None:
+            return qa_agent
         
         # Execute the graph with the initial state as a simple dictionary
-        final_state = graph.invoke({"urls": urls})
+        final_state = get_compiled_graph().invoke({"urls": urls})
+        _cache_agent(urls, final_state)
         
         # Get the agent from the final state
-        qa_agent = final_state["agent"]
+        return final_state["agent"]
+        
+    except Exception as e:
+        raise Exception(f"Error building agent: {e}")
+
+def ingest_videos(urls, on_indexed=None):
+    """Fetch, chunk, dedupe and index videos without building an agent.
+    
+    All transcripts are fetched and deduplicated in one pass. With
+    ``on_indexed`` the chunks are then stored one video at a time and
+    ``on_indexed(url)`` is called as soon as that video is searchable.
+    Returns the ids of the videos now searchable in the corpus index.
+    """
+    state = process_videos_node({"urls": urls})
+    if not state.get("all_chunks") and not state.get("video_ids"):
+        return []
+    state = dedupe_chunks_node(state)
+    if on_indexed is None:
+        store_embeddings_node(state)
+        return state["video_ids"]
+    
+    from tools.chromadb_tool import document_video_id
+    from tools.dedup import video_flag
+    remaining = state["all_chunks"]
+    for video_id in dict.fromkeys(state["video_ids"]):
+        # A video's own chunks plus the chunks kept in place of its duplicates
+        flag = video_flag(video_id)
+        needed = [chunk for chunk in remaining if document_video_id(chunk) == video_id or chunk.metadata.get(flag)]
+        if needed:
+            store_embeddings(needed, collection_name=CORPUS_COLLECTION)
+            remaining = [chunk for chunk in remaining if not (document_video_id(chunk) == video_id or chunk.metadata.get(flag))]
+        mark_videos_indexed([video_id], collection_name=CORPUS_COLLECTION)
+        for url in urls:
+            if (extract_video_id(url) or url) == video_id:
+                on_indexed(url)
+    if remaining:
+        store_embeddings(remaining, collection_name=CORPUS_COLLECTION)
+    return state["video_ids"]
+
+_ingest_jobs = None
+_ingest_jobs_lock = threading.Lock()
+
+def get_ingest_jobs():
+    """Return the process-wide background ingest runner, resuming unfinished jobs on first use."""
+    global _ingest_jobs
+    with _ingest_jobs_lock:
+        if _ingest_jobs is None:
+            from tools.ingest_jobs import IngestJobs, IngestJobStore
+            _ingest_jobs = IngestJobs(
+                IngestJobStore(get_setting("ingest_jobs.path", "cache/ingest_jobs.sqlite3")),
+                ingest_videos,
+                max_workers=get_setting("ingest_jobs.max_workers", 2),
+            )
+            _ingest_jobs.resume()
+    return _ingest_jobs
+
+@lru_cache(maxsize=1)
+def get_async_compiled_graph():
+    """Compile the graph with the async fetch and embedding nodes, once per process."""
+    from langgraph.graph import StateGraph
+    builder = StateGraph(GraphState)
+    builder.add_node("process_videos", _timed_node("process_videos", aprocess_videos_node))
+    builder.add_node("dedupe_chunks", _timed_node("dedupe_chunks", dedupe_chunks_node))
+    builder.add_node("store_embeddings", _timed_node("store_embeddings", astore_embeddings_node))
+    builder.add_node("create_agent", _timed_node("create_agent", create_agent_node))
+    builder.set_entry_point("process_videos")
+    builder.add_edge("process_videos", "dedupe_chunks")
+    builder.add_edge("dedupe_chunks", "store_embeddings")
+    builder.add_edge("store_embeddings", "create_agent")
+    return builder.compile()
+
+async def abuild_graph_and_agent(urls):
+    """Async ``build_graph_and_agent``, sharing its agent cache."""
+    try:
+        qa_agent = _cached_agent(urls)
+        if qa_agent is not None:
+            return qa_agent
         
-        return qa_agent
+        final_state = await get_async_compiled_graph().ainvoke({"urls": urls})
+        _cache_agent(urls, final_state)
+        return final_state["agent"]
         
     except Exception as e:
         raise Exception(f"Error building agent: {e}")
 
+def stream_answer(agent, inputs):
+    """Yield the answer to ``inputs["input"]`` in pieces as it is generated.
+
+    Direct-mode agents stream LLM tokens; the AgentExecutor can only hand
+    back its final output, which is yielded as a single piece. The
+    conversation history is trimmed to the ``context.history_tokens`` budget.
+    """
+    from tools.context_budget import budget_history
+    inputs = {**inputs, "conversation_history": budget_history(inputs.get("conversation_history"))}
+    if getattr(agent, "streams_tokens", False):
+        yield from agent.stream(inputs)
+        return
+    response = agent.invoke(inputs)
+    yield response["output"] if isinstance(response, dict) and "output" in response else str(response)
+
+async def astream_answer(agent, inputs):
+    """Async counterpart of ``stream_answer``."""
+    from tools.context_budget import budget_history
+    inputs = {**inputs, "conversation_history": budget_history(inputs.get("conversation_history"))}
+    if getattr(agent, "streams_tokens", False):
+        async for token in agent.astream(inputs):
+            yield token
+        return
+    response = await agent.ainvoke(inputs)
+    yield response["output"] if isinstance(response, dict) and "output" in response else str(response)
+
+async def aanswer(agent, inputs):
+    """Answer a question without blocking the event loop."""
+    return "".join([token async for token in astream_answer(agent, inputs)])
+
 def main():
+    from tools.context_budget import budget_history
+    
     # Get list of YouTube URLs
     urls = []
     print("Enter YouTube URLs (one per line, type 'done' when finished):")
@@ -242,28 +567,9 @@ def main():
         return
     
     try:
-        # Create LangGraph builder with state schema
-        builder = StateGraph(GraphState)
-        
-        # Add nodes
-        builder.add_node("process_videos", process_videos_node)
-        builder.add_node("store_embeddings", store_embeddings_node)
-        builder.add_node("create_agent", create_agent_node)
-        
-        # Connect nodes
-        builder.set_entry_point("process_videos")
-        builder.add_edge("process_videos", "store_embeddings")
-        builder.add_edge("store_embeddings", "create_agent")
-        
-        # Compile the graph
-        graph = builder.compile()
-        
-        # Execute the graph with the initial state as a simple dictionary
-        final_state = graph.invoke({"urls": urls})
-        
-        # Get the agent from the final state
-        qa_agent = final_state["agent"]
-        conversation_history = final_state["conversation_history"]
+        # Build (or reuse) the agent for these videos
+        qa_agent = build_graph_and_agent(urls)
+        conversation_history = []
         
         # Define system prompt to explain the task
         system_prompt = """
@@ -286,21 +592,22 @@ def main():
             # Update the conversation history with the new user query
             conversation_history.append({"role": "user", "content": query})
             
-            # Get response from the QA agent, including the conversation history
+            # Stream the response from the QA agent, including the conversation history
             try:
-                response = qa_agent.invoke({
+                print("\nAnswer: ", end="", flush=True)
+                answer = ""
+                for token in stream_answer(qa_agent, {
                     "input": query,
                     "conversation_history": conversation_history
-                })
-                
-                # Print the answer
-                if "output" in response:
-                    print(f"\nAnswer: {response['output']}\n")
-                else:
-                    print(f"\nAnswer: {response}\n")
+                }):
+                    answer += token
+                    print(token, end="", flush=True)
+                print("\n")
                 
                 # Update the conversation history with the agent's response
-                conversation_history.append({"role": "assistant", "content": response['output']})
+                conversation_history.append({"role": "assistant", "content": answer})
+                # Only the turns that still fit the history budget are worth keeping
+                conversation_history = budget_history(conversation_history)
             except Exception as e:
                 print(f"\nError getting response: {e}\n")
                 print("Please try a different question.")
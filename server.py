@@ -0,0 +1,195 @@
+import argparse
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import get_setting, set_setting
+from main import build_graph_and_agent, stream_answer
+from tools.metrics import registry, timed
+
+
+class QueueFull(Exception):
+    """Raised when the request queue is at capacity."""
+
+
+class _Job:
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.fn(*self.args)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+class RequestQueue:
+    """Bounded queue of work drained by a fixed pool of worker threads.
+
+    ``submit`` fails fast with QueueFull once ``queue_size`` jobs are waiting,
+    which the HTTP layer turns into a 503 so load balancers can back off.
+    """
+
+    def __init__(self, workers=8, queue_size=64):
+        self._jobs = queue.Queue(maxsize=queue_size)
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"qa-worker-{i}", daemon=True).start()
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            job.run()
+            self._jobs.task_done()
+
+    def qsize(self):
+        return self._jobs.qsize()
+
+    def submit(self, fn, *args, timeout=None):
+        job = _Job(fn, args)
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            raise QueueFull()
+        if not job.done.wait(timeout):
+            raise TimeoutError(f"Request did not finish within {timeout}s")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+
+def ingest(urls):
+    with timed("request.ingest", videos=len(urls)):
+        build_graph_and_agent(urls)
+    return {"urls": urls, "ready": True}
+
+
+def ask(urls, question, conversation_history):
+    with timed("request.ask", videos=len(urls)):
+        agent = build_graph_and_agent(urls)
+        answer = "".join(stream_answer(agent, {
+            "input": question,
+            "conversation_history": conversation_history
+        }))
+    return {"answer": answer}
+
+
+class QARequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoints: POST /ingest, POST /ask, GET /healthz; GET /metrics for Prometheus."""
+
+    request_queue = None
+    request_timeout = None
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_text(self, status, text, content_type):
+        payload = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_text(200, registry.render_prometheus(), "text/plain; version=0.0.4")
+        elif self.path == "/healthz":
+            self._send_json(200, {"status": "ok", "queued": self.request_queue.qsize()})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": "Request body must be JSON"})
+            return
+
+        urls = body.get("urls")
+        if not isinstance(urls, list) or not urls:
+            self._send_json(400, {"error": "'urls' must be a non-empty list"})
+            return
+
+        if self.path == "/ingest":
+            job = (ingest, urls)
+        elif self.path == "/ask":
+            question = body.get("question")
+            if not question:
+                self._send_json(400, {"error": "'question' is required"})
+                return
+            job = (ask, urls, question, body.get("conversation_history") or [])
+        else:
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            result = self.request_queue.submit(*job, timeout=self.request_timeout)
+        except QueueFull:
+            self._send_json(503, {"error": "Server busy, retry later"}, {"Retry-After": "1"})
+        except TimeoutError as e:
+            self._send_json(504, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+        else:
+            self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        print(f"[HTTP] {self.address_string()} {format % args}")
+
+
+def serve(host, port, workers, queue_size, request_timeout):
+    QARequestHandler.request_queue = RequestQueue(workers=workers, queue_size=queue_size)
+    QARequestHandler.request_timeout = request_timeout
+    httpd = ThreadingHTTPServer((host, port), QARequestHandler)
+    print(f"Serving video QA on http://{host}:{port} ({workers} workers, queue of {queue_size})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless HTTP service for the video QA bot.")
+    parser.add_argument("--host", default=get_setting("server.host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=get_setting("server.port", 8000))
+    parser.add_argument("--workers", type=int, default=get_setting("server.workers", 8))
+    parser.add_argument("--queue-size", type=int, default=get_setting("server.queue_size", 64))
+    parser.add_argument("--request-timeout", type=float, default=get_setting("server.request_timeout", 120))
+    parser.add_argument("--stub", action="store_true",
+                        help="use fake LLM and embedding backends for local load testing")
+    args = parser.parse_args()
+
+    # Structured stage timings from tools.metrics go to stderr as JSON lines
+    metrics_logger = logging.getLogger("qa_bot")
+    metrics_logger.setLevel(logging.INFO)
+    metrics_logger.addHandler(logging.StreamHandler())
+
+    # Share embedding calls across concurrent ingests
+    set_setting("embeddings.micro_batch.enabled", True)
+    if args.stub:
+        set_setting("embeddings.provider", "fake")
+        set_setting("embeddings.model", "fake")
+        set_setting("qa.llm_provider", "fake")
+
+    serve(args.host, args.port, args.workers, args.queue_size, args.request_timeout)
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+
+from config import get_setting
+from main import aanswer, abuild_graph_and_agent, astream_answer
+
+
+class QAService:
+    """Serve many concurrent questions from one process over shared indexes.
+
+    Agents come from the process-wide cache in ``main``, so every caller
+    asking about the same videos shares one agent and one corpus index.
+    At most ``max_concurrent`` questions are in flight at a time; the rest
+    wait on the semaphore instead of piling onto the LLM provider.
+    """
+
+    def __init__(self, max_concurrent=None):
+        if max_concurrent is None:
+            max_concurrent = get_setting("service.max_concurrent_questions", 32)
+        self._questions = asyncio.Semaphore(max_concurrent)
+        self._ingests = {}
+
+    async def ingest(self, urls):
+        """Fetch, chunk and index videos, returning the agent for them.
+
+        Concurrent callers asking for the same videos share a single build.
+        """
+        key = tuple(sorted(set(urls)))
+        task = self._ingests.get(key)
+        if task is None:
+            task = asyncio.ensure_future(abuild_graph_and_agent(list(key)))
+            self._ingests[key] = task
+            task.add_done_callback(lambda _: self._ingests.pop(key, None))
+        return await task
+
+    async def ask(self, urls, question, conversation_history=None):
+        """Answer one question about a set of videos."""
+        agent = await self.ingest(urls)
+        async with self._questions:
+            return await aanswer(agent, {
+                "input": question,
+                "conversation_history": conversation_history or []
+            })
+
+    async def stream(self, urls, question, conversation_history=None):
+        """Yield the answer to one question token by token."""
+        agent = await self.ingest(urls)
+        async with self._questions:
+            async for token in astream_answer(agent, {
+                "input": question,
+                "conversation_history": conversation_history or []
+            }):
+                yield token
+
+
+async def run(urls, questions):
+    service = QAService()
+    await service.ingest(urls)
+    answers = await asyncio.gather(*(service.ask(urls, question) for question in questions))
+    for question, answer in zip(questions, answers):
+        print(f"\nQ: {question}\nA: {answer}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer several questions about YouTube videos concurrently.")
+    parser.add_argument("urls", nargs="+", help="YouTube video URLs")
+    parser.add_argument("-q", "--question", action="append", required=True, help="question to ask (repeatable)")
+    args = parser.parse_args()
+    asyncio.run(run(args.urls, args.question))
@@ -0,0 +1,32 @@
+import os
+import sys
+
+# Tests import the app modules the way the entry points do, from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def offline_corpus(tmp_path, monkeypatch):
+    """Point the corpus index at fake embeddings and a NumPy store under ``tmp_path``."""
+    import config
+    from tools import chromadb_tool
+    from tools.embeddings import _build_embeddings
+
+    monkeypatch.setattr(config, "_overrides", {})
+    for key, value in {
+        "embeddings.provider": "fake",
+        "embeddings.model": "test-fake",
+        "embeddings.fake_size": 16,
+        "cache.embeddings_dir": str(tmp_path / "embeddings"),
+        "vector_store.backend": "numpy",
+        "vector_store.numpy_dir": str(tmp_path / "vectors"),
+        "vector_store.markers_path": str(tmp_path / "indexed_videos.sqlite3"),
+    }.items():
+        config.set_setting(key, value)
+    monkeypatch.setattr(chromadb_tool, "_vector_stores", {})
+    monkeypatch.setattr(chromadb_tool, "_index_markers", None)
+    _build_embeddings.cache_clear()
+    yield tmp_path
+    _build_embeddings.cache_clear()
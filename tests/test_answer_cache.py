@@ -0,0 +1,91 @@
+import asyncio
+
+from tools.answer_cache import AnswerCache, CachedVideoQA, FailedAnswer
+
+
+class StreamingAgent:
+    streams_tokens = True
+
+    def __init__(self, tokens, error=None):
+        self.tokens = tokens
+        self.error = error
+        self.calls = 0
+
+    def stream(self, inputs):
+        self.calls += 1
+        yield from self.tokens
+        if self.error:
+            raise self.error
+
+    async def astream(self, inputs):
+        for token in self.stream(inputs):
+            yield token
+
+
+class ExecutorLike:
+    """Stands in for an AgentExecutor run with ``return_intermediate_steps``."""
+
+    max_iterations = 3
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def invoke(self, inputs):
+        return {"input": inputs["input"], "output": "an answer", "intermediate_steps": self.steps}
+
+
+def cached(tmp_path, inner):
+    return CachedVideoQA(inner, AnswerCache(str(tmp_path / "answers.sqlite3")), ["v1"], "model")
+
+
+def ask(qa, question="What is it?"):
+    return qa.invoke({"input": question, "conversation_history": []})["output"]
+
+
+def test_answers_are_cached_and_reused(tmp_path):
+    inner = StreamingAgent(["It is ", "a fox."])
+    qa = cached(tmp_path, inner)
+    assert ask(qa) == "It is a fox."
+    assert ask(qa, "what is it") == "It is a fox."
+    assert inner.calls == 1
+
+
+def test_failed_streams_are_not_cached(tmp_path):
+    for inner in (StreamingAgent(["It is ", FailedAnswer(" [interrupted]")]),
+                  StreamingAgent([FailedAnswer("Sorry.")])):
+        qa = cached(tmp_path, inner)
+        ask(qa)
+        ask(qa)
+        assert inner.calls == 2
+
+
+def test_raising_streams_are_not_cached(tmp_path):
+    qa = cached(tmp_path, StreamingAgent(["partial"], error=RuntimeError("boom")))
+    try:
+        ask(qa)
+    except RuntimeError:
+        pass
+    assert qa.cache.lookup(["v1"], "model", "What is it?")[0] is None
+
+
+def test_cut_off_or_failed_agent_runs_are_not_cached(tmp_path):
+    for steps in ([("action", "obs")] * 3, [("action", FailedAnswer("tool failed"))]):
+        qa = cached(tmp_path, ExecutorLike(steps))
+        assert ask(qa) == "an answer"
+        assert qa.cache.lookup(["v1"], "model", "What is it?")[0] is None
+    qa = cached(tmp_path, ExecutorLike([("action", "obs")]))
+    ask(qa)
+    assert qa.cache.lookup(["v1"], "model", "What is it?")[0] == "an answer"
+
+
+def test_async_stream_caches_like_the_sync_one(tmp_path):
+    inner = StreamingAgent(["It is ", "a fox."])
+    qa = cached(tmp_path, inner)
+
+    async def run():
+        first = await qa.ainvoke({"input": "What is it?", "conversation_history": []})
+        second = await qa.ainvoke({"input": "What is it?", "conversation_history": []})
+        return first["output"], second["output"]
+
+    assert asyncio.run(run()) == ("It is a fox.", "It is a fox.")
+    assert inner.calls == 1
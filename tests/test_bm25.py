@@ -0,0 +1,41 @@
+from tools.bm25 import BM25Index, tokenize
+
+
+def index():
+    bm25 = BM25Index()
+    bm25.add("a", "The quick brown fox jumps", {"video_id": "v1"})
+    bm25.add("b", "A lazy dog sleeps all day", {"video_id": "v1"})
+    bm25.add("c", "Fox news: a fox and another fox", {"video_id": "v2"})
+    return bm25
+
+
+def test_tokenize_lowercases_words_and_numbers():
+    assert tokenize("GPT-4 costs $20, Alice's") == ["gpt", "4", "costs", "20", "alice", "s"]
+
+
+def test_ranks_by_term_frequency_and_rarity():
+    ids = [doc_id for doc_id, _, _, _ in index().search("fox")]
+    assert ids == ["c", "a"]
+    scores = [score for _, _, _, score in index().search("lazy fox")]
+    assert scores == sorted(scores, reverse=True) and len(scores) == 3
+
+
+def test_readding_an_id_is_a_no_op():
+    bm25 = index()
+    bm25.add("a", "completely different text")
+    assert len(bm25) == 3 and "a" in bm25
+    assert bm25.search("different") == []
+
+
+def test_where_and_k_apply_after_ranking():
+    bm25 = index()
+    # "dog" is rarer than "fox", so its one match outranks the other fox
+    assert [hit[0] for hit in bm25.search("fox dog", where={"video_id": "v1"})] == ["b", "a"]
+    assert [hit[0] for hit in bm25.search("fox", k=1)] == ["c"]
+    bm25.set_metadata("c", {"video_id": "v1"})
+    assert [hit[0] for hit in bm25.search("fox", where={"video_id": "v1"})] == ["c", "a"]
+
+
+def test_empty_index_or_query():
+    assert BM25Index().search("fox") == []
+    assert index().search("!!!") == []
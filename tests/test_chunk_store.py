@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+
+import pytest
+
+from tools.chunk_store import ChunkStore
+
+
+def chunks(*texts):
+    return [
+        {"page_content": text, "metadata": {"chunk_index": i, "start": float(i), "end": float(i) + 1.5}}
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_reload_returns_chunks_and_respects_chunking(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put("v1", "url1", chunks("hello", "wörld"), chunking=(300, 40))
+    store.put("v2", "url2", chunks("other"), chunking=(300, 40))
+
+    reopened = ChunkStore(str(tmp_path))
+    assert len(reopened) == 2 and "v1" in reopened
+    assert reopened.get("v1", (300, 40)) == [
+        {"page_content": "hello", "metadata": {"source": "url1", "video_id": "v1", "chunk_index": 0, "start": 0.0, "end": 1.5}},
+        {"page_content": "wörld", "metadata": {"source": "url1", "video_id": "v1", "chunk_index": 1, "start": 1.0, "end": 2.5}},
+    ]
+    assert reopened.get("v1", (200, 40)) is None
+    assert reopened.get("missing") is None
+
+
+def test_bytes_appended_after_the_manifest_are_dropped(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put("v1", "url1", chunks("hello"))
+    # A crash after the appends but before the manifest write
+    with open(tmp_path / "chunks.dat", "ab") as f:
+        f.write(b"STALE")
+    with open(tmp_path / "chunks.idx", "ab") as f:
+        f.write(b"\0" * 7)
+
+    reopened = ChunkStore(str(tmp_path))
+    reopened.put("v2", "url2", chunks("world"))
+    again = ChunkStore(str(tmp_path))
+    assert [chunk["page_content"] for chunk in again.get("v1")] == ["hello"]
+    assert [chunk["page_content"] for chunk in again.get("v2")] == ["world"]
+
+
+def test_leftovers_without_a_manifest_are_dropped(tmp_path):
+    # The very first put crashed before writing the manifest
+    with open(tmp_path / "chunks.dat", "wb") as f:
+        f.write(b"STALE-BYTES")
+    with open(tmp_path / "chunks.idx", "wb") as f:
+        f.write(b"\0" * 5)
+
+    store = ChunkStore(str(tmp_path))
+    store.put("v1", "url1", chunks("hello world"))
+    assert os.path.getsize(tmp_path / "chunks.dat") == len("hello world")
+    assert ChunkStore(str(tmp_path)).get("v1")[0]["page_content"] == "hello world"
+
+
+def _put_many(directory, prefix):
+    store = ChunkStore(directory)
+    for i in range(30):
+        store.put(f"{prefix}{i}", f"url-{prefix}{i}", chunks(f"{prefix}{i} first", f"{prefix}{i} second"))
+
+
+@pytest.mark.skipif(os.name != "posix", reason="cross-process locking needs fcntl")
+def test_processes_sharing_the_store_see_each_others_puts(tmp_path):
+    reader = ChunkStore(str(tmp_path))
+    assert len(reader) == 0
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_put_many, args=(str(tmp_path), prefix)) for prefix in "abc"]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    # The reader opened before the puts picks them up too
+    for store in (reader, ChunkStore(str(tmp_path))):
+        assert len(store) == 90
+        for prefix in "abc":
+            for i in range(30):
+                texts = [chunk["page_content"] for chunk in store.get(f"{prefix}{i}")]
+                assert texts == [f"{prefix}{i} first", f"{prefix}{i} second"]
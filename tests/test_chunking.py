@@ -0,0 +1,45 @@
+from tools.chunking import chunk_segments, chunk_transcript, count_tokens, normalize_segments
+
+
+def segments(count, words=3, duration=2.0):
+    return [{"text": " ".join(f"w{i}x{j}" for j in range(words)), "start": i * duration, "duration": duration}
+            for i in range(count)]
+
+
+def test_normalize_segments_accepts_plain_strings():
+    assert normalize_segments(["hi", {"text": "there", "start": 1.0}]) == [
+        {"text": "hi", "start": None, "duration": None},
+        {"text": "there", "start": 1.0, "duration": None},
+    ]
+
+
+def test_chunks_respect_the_token_budget_and_cover_every_segment():
+    source = segments(20)
+    size = 3 * count_tokens(source[0]["text"])
+    chunks = chunk_segments(source, size)
+    assert all(count_tokens(chunk["text"]) <= size for chunk in chunks)
+    assert " ".join(chunk["text"] for chunk in chunks) == " ".join(s["text"] for s in source)
+    assert chunks[0]["start"] == 0.0 and chunks[-1]["end"] == 40.0
+
+
+def test_overlap_repeats_trailing_segments():
+    source = segments(10)
+    per_segment = count_tokens(source[0]["text"])
+    chunks = chunk_segments(source, 3 * per_segment, chunk_overlap=per_segment)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["text"].startswith(previous["text"].split(" ", 6)[-1])
+        assert chunk["start"] < previous["end"]
+
+
+def test_long_segment_is_split():
+    chunks = chunk_segments(segments(1, words=50), 10)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk["text"]) <= 10 for chunk in chunks)
+
+
+def test_chunk_transcript_metadata():
+    documents = chunk_transcript("https://youtu.be/abc123", ["first line", "", "second line"], chunk_size=100)
+    assert documents == [{
+        "page_content": "first line second line",
+        "metadata": {"source": "https://youtu.be/abc123", "video_id": "abc123", "chunk_index": 0},
+    }]
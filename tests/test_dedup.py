@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+
+import pytest
+from langchain_core.documents import Document
+
+from tools.dedup import SignatureIndex, dedupe_chunks, video_flag
+
+TEXT = "the quick brown fox jumps over the lazy dog and then runs far away into the forest"
+
+
+def chunk(video_id, text=TEXT, index=0):
+    return Document(page_content=text, metadata={"video_id": video_id, "source": f"url-{video_id}", "chunk_index": index})
+
+
+def dedupe(directory, documents):
+    return dedupe_chunks(documents, index=SignatureIndex(128, 16, str(directory)))
+
+
+def test_later_ingest_is_deduped_against_the_reloaded_index(tmp_path):
+    assert dedupe(tmp_path, [chunk("A")]) == ([chunk("A")], 0)
+
+    kept, dropped = dedupe(tmp_path, [chunk("B", index=3), chunk("C", TEXT + " today")])
+    assert dropped == 2
+    assert [document.metadata["video_id"] for document in kept] == ["A"]
+    assert kept[0].metadata[video_flag("B")] and kept[0].metadata[video_flag("C")]
+
+    # Ingesting the stored chunk itself again keeps it as is
+    assert dedupe(tmp_path, [chunk("A")]) == ([chunk("A")], 0)
+
+
+def test_torn_append_is_truncated(tmp_path):
+    dedupe(tmp_path, [chunk("A")])
+    with open(tmp_path / "chunks.jsonl", "ab") as f:
+        f.write(b'{"text": "half')
+
+    other = "a completely different chunk about cooking pasta with garlic and olive oil tonight"
+    assert dedupe(tmp_path, [chunk("D", other)])[1] == 0
+    index = SignatureIndex(128, 16, str(tmp_path))
+    with index.locked():
+        assert [document.metadata["video_id"] for document in index.documents] == ["A", "D"]
+
+
+def _dedupe_one(directory, video_id):
+    dedupe(directory, [chunk(video_id)])
+
+
+@pytest.mark.skipif(os.name != "posix", reason="cross-process locking needs fcntl")
+def test_concurrent_processes_dedupe_against_each_other(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_dedupe_one, args=(str(tmp_path), f"V{i}")) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    index = SignatureIndex(128, 16, str(tmp_path))
+    with index.locked():
+        assert len(index.documents) == 1
@@ -0,0 +1,67 @@
+import asyncio
+
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from agents.direct_qa import ERROR_ANSWER, INTERRUPTED_ANSWER, NO_CONTEXT_ANSWER, DirectVideoQA
+from tools.answer_cache import FailedAnswer
+
+
+class Retriever:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def invoke(self, query):
+        return self.documents
+
+    async def ainvoke(self, query):
+        return self.documents
+
+
+class FailingLLM:
+    """Streams ``tokens`` and then raises."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def stream(self, messages):
+        for token in self.tokens:
+            yield AIMessage(content=token)
+        raise RuntimeError("connection reset")
+
+    async def astream(self, messages):
+        for token in self.stream(messages):
+            yield token
+
+
+DOCUMENTS = [Document(page_content="The fox is brown.", metadata={"video_id": "v1", "start": 65.0})]
+INPUTS = {"input": "What colour is the fox?", "conversation_history": []}
+
+
+def collect(qa):
+    async def run():
+        return [token async for token in qa.astream(INPUTS)]
+    return list(qa.stream(INPUTS)), asyncio.run(run())
+
+
+def test_streams_llm_tokens():
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="It is brown."), AIMessage(content="It is brown.")]))
+    sync, async_ = collect(DirectVideoQA(llm, Retriever(DOCUMENTS)))
+    assert "".join(sync) == "".join(async_) == "It is brown."
+
+
+def test_no_documents_gives_the_refusal():
+    assert collect(DirectVideoQA(FailingLLM([]), Retriever([]))) == ([NO_CONTEXT_ANSWER], [NO_CONTEXT_ANSWER])
+
+
+def test_failure_before_any_token_gives_the_error_answer():
+    sync, async_ = collect(DirectVideoQA(FailingLLM([]), Retriever(DOCUMENTS)))
+    assert sync == async_ == [ERROR_ANSWER]
+    assert isinstance(sync[-1], FailedAnswer)
+
+
+def test_failure_mid_stream_ends_with_the_interruption_marker():
+    sync, async_ = collect(DirectVideoQA(FailingLLM(["It is ", "bro"]), Retriever(DOCUMENTS)))
+    assert sync == async_ == ["It is ", "bro", INTERRUPTED_ANSWER]
+    assert ERROR_ANSWER not in sync and isinstance(sync[-1], FailedAnswer)
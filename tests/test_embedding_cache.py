@@ -0,0 +1,79 @@
+import hashlib
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from tools.embedding_cache import CachedEmbeddings
+
+
+class HashEmbeddings:
+    """Deterministic vectors derived from each text, counting model calls."""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.calls = 0
+
+    def vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self.vector(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.vector(text).tolist()
+
+
+def test_reload_serves_cached_vectors_without_the_model(tmp_path):
+    inner = HashEmbeddings()
+    cache = CachedEmbeddings(inner, "m", directory=str(tmp_path))
+    first = cache.embed_array(["a", "b", "a"])
+    assert inner.calls == 1 and cache.stats()["entries"] == 2
+
+    reopened_inner = HashEmbeddings()
+    reopened = CachedEmbeddings(reopened_inner, "m", directory=str(tmp_path))
+    np.testing.assert_array_equal(reopened.embed_array(["a", "b", "a"]), first)
+    assert reopened_inner.calls == 0
+
+
+def test_torn_append_is_truncated_and_recomputed(tmp_path):
+    inner = HashEmbeddings()
+    cache = CachedEmbeddings(inner, "m", directory=str(tmp_path))
+    cache.embed_array(["a", "b"])
+    # A crash after the vector append but before the keys append
+    with open(os.path.join(cache.directory, "vectors.f32"), "ab") as f:
+        f.write(np.zeros(8, dtype=np.float32).tobytes())
+
+    reopened = CachedEmbeddings(HashEmbeddings(), "m", directory=str(tmp_path))
+    vectors = reopened.embed_array(["c", "a"])
+    np.testing.assert_array_equal(vectors[0], inner.vector("c"))
+    np.testing.assert_array_equal(vectors[1], inner.vector("a"))
+    assert reopened.stats()["entries"] == 3
+
+
+def _embed_many(directory, texts):
+    cache = CachedEmbeddings(HashEmbeddings(), "m", directory=directory)
+    for start in range(0, len(texts), 7):
+        cache.embed_array(texts[start:start + 7])
+
+
+@pytest.mark.skipif(os.name != "posix", reason="cross-process locking needs fcntl")
+def test_processes_sharing_the_cache_keep_rows_aligned(tmp_path):
+    texts = [f"text {i}" for i in range(300)]
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_embed_many, args=(str(tmp_path), texts[offset:] + texts[:offset]))
+               for offset in (0, 100, 200)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    inner = HashEmbeddings()
+    cache = CachedEmbeddings(inner, "m", directory=str(tmp_path))
+    vectors = cache.embed_array(texts)
+    assert inner.calls == 0 and cache.stats()["entries"] == len(texts)
+    np.testing.assert_array_equal(vectors, np.array([inner.vector(text) for text in texts]))
@@ -0,0 +1,43 @@
+from langchain_core.documents import Document
+
+from tools.bm25 import BM25Index
+from tools.hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+
+
+class VectorStore:
+    """Returns fixed dense hits and records the filter it was given."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.filters = []
+
+    def similarity_search(self, query, k=4, filter=None):
+        self.filters.append(filter)
+        return self.documents[:k]
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]]) == ["b", "c", "a", "d"]
+    assert reciprocal_rank_fusion([["x"], []]) == ["x"]
+
+
+def test_fuses_dense_and_sparse_hits_on_video_and_text():
+    bm25 = BM25Index()
+    for doc_id, text in (("1", "rust borrow checker"), ("2", "python garbage collector"), ("3", "rust lifetimes")):
+        bm25.add(doc_id, text, {"video_id": "v1", "chunk_index": int(doc_id)})
+    dense = [
+        Document(page_content="python garbage collector", metadata={"video_id": "v1", "start": 5.0}),
+        Document(page_content="rust lifetimes", metadata={"video_id": "v1", "start": 9.0}),
+        Document(page_content="rust lifetimes", metadata={"video_id": "v2"}),
+    ]
+    store = VectorStore(dense)
+    retriever = HybridRetriever(vector_store=store, bm25_index=bm25, k=3, where={"video_id": "v1"})
+
+    documents = retriever.invoke("rust lifetimes")
+    # Found by both sides, so first; the dense copy (with its timestamp) is kept
+    assert documents[0].page_content == "rust lifetimes" and documents[0].metadata["start"] == 9.0
+    assert [(d.metadata["video_id"], d.page_content) for d in documents[1:]] == [
+        ("v1", "python garbage collector"),
+        ("v1", "rust borrow checker"),
+    ]
+    assert store.filters == [{"video_id": "v1"}]
@@ -0,0 +1,30 @@
+from langchain_core.documents import Document
+
+from tools.chromadb_tool import (
+    CORPUS_COLLECTION, get_vector_store, indexed_video_ids, mark_videos_indexed, store_embeddings,
+)
+
+
+def chunks(video_id, n=3):
+    return [Document(page_content=f"{video_id} chunk {i}", metadata={"video_id": video_id, "chunk_index": i})
+            for i in range(n)]
+
+
+def test_only_marked_videos_count_as_indexed(offline_corpus):
+    # v1's add finished; v2's was interrupted after its first chunks
+    store_embeddings(chunks("v1") + chunks("v2", 1), collection_name=CORPUS_COLLECTION)
+    mark_videos_indexed(["v1"])
+    assert indexed_video_ids(["v1", "v2", "v3"]) == {"v1"}
+
+
+def test_markers_without_rows_do_not_count(offline_corpus):
+    mark_videos_indexed(["gone"])
+    assert indexed_video_ids(["gone"]) == set()
+
+
+def test_rebuilding_the_collection_clears_its_markers(offline_corpus):
+    store_embeddings(chunks("v1"), collection_name=CORPUS_COLLECTION)
+    mark_videos_indexed(["v1"])
+    store_embeddings(chunks("v2"), collection_name=CORPUS_COLLECTION, incremental=False)
+    assert get_vector_store().get(include=())["ids"]
+    assert indexed_video_ids(["v1", "v2"]) == set()
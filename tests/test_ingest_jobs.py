@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from tools.ingest_jobs import DONE, FAILED, RUNNING, IngestJobs, IngestJobStore
+
+
+def wait_finished(store, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while store.get(job_id)["status"] not in (DONE, FAILED):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return store.get(job_id)
+
+
+def test_job_ingests_all_videos_in_one_call_and_marks_them_as_they_land(tmp_path):
+    store = IngestJobStore(str(tmp_path / "jobs.sqlite3"))
+    calls, seen = [], []
+
+    def ingest(urls, on_indexed):
+        calls.append(list(urls))
+        for url in ("u0", "u2"):
+            on_indexed(url)
+            seen.append([video["status"] for video in store.get(job_id)["videos"]])
+        return ["u0", "u2"]
+
+    jobs = IngestJobs(store, ingest)
+    job_id = jobs.submit(["u0", "u1", "u2"])
+    job = wait_finished(store, job_id)
+
+    assert calls == [["u0", "u1", "u2"]]
+    assert seen[0] == [DONE, RUNNING, RUNNING]
+    assert [(video["status"], video["error"]) for video in job["videos"]] == [
+        (DONE, None), (FAILED, "No transcript could be indexed"), (DONE, None),
+    ]
+    assert job["status"] == DONE and jobs.ready_urls(job_id) == ["u0", "u2"]
+
+
+def test_resume_runs_only_unfinished_videos(tmp_path):
+    store = IngestJobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create(["u0", "u1", "u2", "u1"])
+    # A previous process finished u0, then died mid-job
+    store.set_job(job_id, RUNNING)
+    store.set_video(job_id, 0, DONE)
+
+    calls = []
+
+    def ingest(urls, on_indexed):
+        calls.append(list(urls))
+        on_indexed("u1")
+        return ["u1"]
+
+    jobs = IngestJobs(store, ingest)
+    assert jobs.resume() == [job_id]
+    job = wait_finished(store, job_id)
+    assert calls == [["u1", "u2"]]
+    assert [video["status"] for video in job["videos"]] == [DONE, DONE, FAILED, DONE]
+    assert jobs.resume() == []
+
+
+def test_ingest_errors_fail_the_pending_videos(tmp_path):
+    store = IngestJobStore(str(tmp_path / "jobs.sqlite3"))
+
+    def ingest(urls, on_indexed):
+        on_indexed("u0")
+        raise RuntimeError("embedding service down")
+
+    jobs = IngestJobs(store, ingest)
+    job = wait_finished(store, jobs.submit(["u0", "u1"]))
+    assert [(video["status"], video["error"]) for video in job["videos"]] == [
+        (DONE, None), (FAILED, "embedding service down"),
+    ]
+
+
+def _claim(path, job_id, barrier, results):
+    import tools.ingest_jobs
+    alive = tools.ingest_jobs._process_alive
+
+    def slow_alive(pid):
+        # Widen the gap between reading the owner and writing ours
+        time.sleep(0.2)
+        return alive(pid)
+
+    tools.ingest_jobs._process_alive = slow_alive
+    barrier.wait()
+    results.put(IngestJobStore(path).claim(job_id))
+    # Stay alive until everyone has tried, so the winner still looks live
+    barrier.wait()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="forks competing processes")
+def test_only_one_process_claims_a_job(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    job_id = IngestJobStore(path).create(["u0"])
+    context = multiprocessing.get_context("fork")
+    barrier, results = context.Barrier(4), context.Queue()
+    workers = [context.Process(target=_claim, args=(path, job_id, barrier, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(results.get() for _ in workers) == [False, False, False, True]
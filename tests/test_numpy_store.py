@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+
+from tools.numpy_store import NumpyVectorStore
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def upsert(store, ids, matrix):
+    store.upsert_vectors(ids, matrix, [f"text {doc_id}" for doc_id in ids], [{"video_id": f"v{doc_id}"} for doc_id in ids])
+
+
+@pytest.mark.parametrize("quantization", ["float32", "float16", "int8"])
+def test_reload_keeps_rows_replacements_and_metadata(tmp_path, quantization):
+    matrix = vectors(4)
+    store = NumpyVectorStore("t", None, directory=str(tmp_path), quantization=quantization)
+    upsert(store, ["a", "b", "c"], matrix[:3])
+    store.upsert_vectors(["b"], matrix[3:], ["replaced"], [{"video_id": "vb"}])
+    store.update_metadatas(["c"], [{"video_id": "vc", "in_video:x": True}])
+
+    reopened = NumpyVectorStore("t", None, directory=str(tmp_path), quantization=quantization)
+    assert reopened.get(ids=["a", "b", "c"]) == {
+        "ids": ["a", "b", "c"],
+        "documents": ["text a", "replaced", "text c"],
+        "metadatas": [{"video_id": "va"}, {"video_id": "vb"}, {"video_id": "vc", "in_video:x": True}],
+    }
+    hit = reopened.similarity_search_by_vectors([matrix[3]], k=1)[0][0][0]
+    assert hit.id == "b"
+    assert reopened.get(where={"in_video:x": True})["ids"] == ["c"]
+
+
+def test_torn_record_is_dropped_and_later_upserts_survive(tmp_path):
+    matrix = vectors(4)
+    store = NumpyVectorStore("t", None, directory=str(tmp_path))
+    upsert(store, ["a", "b"], matrix[:2])
+    with open(tmp_path / "records.jsonl", "ab") as f:
+        f.write(b'{"id": "c", "meta')
+
+    reopened = NumpyVectorStore("t", None, directory=str(tmp_path))
+    assert reopened.get(include=())["ids"] == ["a", "b"]
+    upsert(reopened, ["d"], matrix[3:])
+
+    again = NumpyVectorStore("t", None, directory=str(tmp_path))
+    assert again.get(include=())["ids"] == ["a", "b", "d"]
+    assert again.similarity_search_by_vectors([matrix[3]], k=1)[0][0][0].id == "d"
+
+
+def test_records_without_vectors_are_dropped(tmp_path):
+    matrix = vectors(3)
+    store = NumpyVectorStore("t", None, directory=str(tmp_path))
+    upsert(store, ["a", "b", "c"], matrix)
+    # A crash that lost the last vector row
+    os.truncate(tmp_path / "vectors.f32", 2 * 8 * 4)
+
+    reopened = NumpyVectorStore("t", None, directory=str(tmp_path))
+    assert reopened.get(include=())["ids"] == ["a", "b"]
+    upsert(reopened, ["d"], matrix[2:])
+    again = NumpyVectorStore("t", None, directory=str(tmp_path))
+    assert again.get(include=())["ids"] == ["a", "b", "d"]
+    assert again.similarity_search_by_vectors([matrix[2]], k=1)[0][0][0].id == "d"
+
+
+def test_get_filters_and_limits(monkeypatch):
+    store = NumpyVectorStore("t", None)
+    ids = [str(i) for i in range(10)]
+    store.upsert_vectors(ids, vectors(10), [f"text {i}" for i in ids],
+                         [{"video_id": "even" if int(i) % 2 == 0 else "odd", "n": int(i)} for i in ids])
+    store.update_metadatas(["3", "7"], [{"video_id": "odd", "n": 3, "in_video:x": True},
+                                        {"video_id": "odd", "n": 7, "in_video:x": True}])
+
+    assert store.get(where={"video_id": "odd"}, limit=2, include=())["ids"] == ["1", "3"]
+    assert store.get(where={"$or": [{"in_video:x": True}, {"video_id": {"$in": ["even"]}}]},
+                     include=())["ids"] == ["0", "2", "3", "4", "6", "7", "8"]
+    assert store.get(where={"$or": [{"in_video:x": True}, {"n": 4}]}, limit=2, include=())["ids"] == ["3", "4"]
+    assert store.get(ids=["9", "1", "2"], where={"video_id": "odd"}, limit=1)["documents"] == ["text 9"]
+    assert store.get(limit=3, include=())["ids"] == ["0", "1", "2"]
+
+    # Filters the column index can't answer stop scanning at the limit
+    import tools.numpy_store as numpy_store
+    calls = []
+    matches_filter = numpy_store.matches_filter
+    monkeypatch.setattr(numpy_store, "matches_filter", lambda *args: calls.append(1) or matches_filter(*args))
+    assert store.get(where={"n": {"$nin": [0, 1]}}, limit=2, include=())["ids"] == ["2", "3"]
+    assert len(calls) == 4
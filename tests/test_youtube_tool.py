@@ -0,0 +1,29 @@
+import pytest
+
+import tools.youtube_tool as youtube_tool
+from tools.transcript_store import TranscriptStore
+
+SEGMENTS = [{"text": "hello there", "start": 0.0, "duration": 2.0}]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = TranscriptStore(str(tmp_path / "transcripts"))
+    store.put("dQw4w9WgXcQ", SEGMENTS)
+    monkeypatch.setattr(youtube_tool, "get_transcript_store", lambda: store)
+    return store
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://youtu.be/dQw4w9WgXcQ",
+    "https://www.youtube.com/embed/dQw4w9WgXcQ",
+])
+def test_fetch_accepts_every_url_form(store, url):
+    assert youtube_tool.fetch_youtube_transcript(url) == ["hello there"]
+    assert youtube_tool.fetch_youtube_transcript(url, with_timestamps=True) == SEGMENTS
+
+
+def test_fetch_rejects_urls_without_a_video_id(store):
+    with pytest.raises(ValueError):
+        youtube_tool.fetch_youtube_transcript("https://example.com/watch?v=dQw4w9WgXcQ")
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from config import get_setting
+from tools.metrics import count_cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    scope TEXT NOT NULL,
+    question TEXT NOT NULL,
+    embedding BLOB,
+    answer TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (scope, question)
+)
+"""
+
+
+
+class FailedAnswer(str):
+    """Text an agent yields or returns in place of (part of) an answer after a failure.
+
+    Still shown to the user, but a stream containing one is never cached.
+    """
+
+
+def normalize_question(question):
+    """Lower-case, collapse whitespace and drop surrounding punctuation."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.strip(" ?!.,;:")
+
+
+def cache_scope(video_ids, model_name):
+    """One scope per (sorted video set, LLM model); answers never cross scopes."""
+    key = "\x00".join(sorted(set(video_ids))) + "\x01" + model_name
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Persistent question -> answer cache with paraphrase matching.
+
+    Exact matches on the normalized question are a single SQLite lookup.
+    Otherwise the question embedding is compared against every cached
+    question in the same scope and the best match at or above
+    ``threshold`` cosine similarity is returned. Entries expire after
+    ``ttl`` seconds and the least recently used are evicted past
+    ``max_entries``.
+    """
+
+    def __init__(self, path, embeddings=None, threshold=0.92, ttl=86400, max_entries=5000):
+        self.path = path
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _embed(self, question):
+        if self.embeddings is None:
+            return None
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, video_ids, model_name, question):
+        """Return ``(answer, embedding)``; answer is None on a miss.
+
+        The embedding (if one was computed) can be passed back to ``store``
+        so a miss never embeds the same question twice.
+        """
+        scope = cache_scope(video_ids, model_name)
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT answer FROM answers WHERE scope = ? AND question = ? AND created >= ?",
+                (scope, normalized, now - self.ttl),
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE answers SET last_access = ? WHERE scope = ? AND question = ?",
+                             (now, scope, normalized))
+                self.hits += 1
+                count_cache("answers", True)
+                return row[0], None
+
+        vector = self._embed(normalized)
+        if vector is None:
+            self.misses += 1
+            count_cache("answers", False)
+            return None, None
+
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT question, embedding, answer FROM answers "
+                "WHERE scope = ? AND created >= ? AND embedding IS NOT NULL",
+                (scope, now - self.ttl),
+            ).fetchall()
+            # Skip vectors left over from a different embedding model
+            rows = [row for row in rows if len(row[1]) == vector.nbytes]
+            if rows:
+                matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    conn.execute("UPDATE answers SET last_access = ? WHERE scope = ? AND question = ?",
+                                 (now, scope, rows[best][0]))
+                    self.hits += 1
+                    count_cache("answers", True)
+                    return rows[best][2], vector
+            self.misses += 1
+            count_cache("answers", False)
+        return None, vector
+
+    def store(self, video_ids, model_name, question, answer, embedding=None):
+        """Cache an answer, then drop expired and least recently used entries."""
+        if not answer:
+            return
+        normalized = normalize_question(question)
+        if embedding is None:
+            embedding = self._embed(normalized)
+        blob = embedding.astype(np.float32).tobytes() if embedding is not None else None
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_scope(video_ids, model_name), normalized, blob, answer, now, now),
+            )
+            conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM answers WHERE rowid IN ("
+                "SELECT rowid FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+class CachedVideoQA:
+    """Serve repeated questions about the same videos from an AnswerCache.
+
+    Wraps a session's agent (direct or AgentExecutor) and keeps its
+    ``invoke``/``stream``/``astream`` interface. Follow-up questions, i.e.
+    calls whose history already holds an answer, bypass the cache because
+    their meaning depends on the conversation. Answers whose stream raised
+    or reported a failure (a ``FailedAnswer`` token, or an agent run that
+    hit its iteration limit or a failing tool) are not stored.
+    """
+
+    streams_tokens = True
+
+    def __init__(self, inner, cache, video_ids, model_name):
+        self.inner = inner
+        self.cache = cache
+        self.video_ids = sorted(set(video_ids))
+        self.model_name = model_name
+
+    def _cacheable(self, inputs):
+        history = inputs.get("conversation_history") or []
+        return not any(isinstance(turn, dict) and turn.get("role") == "assistant" for turn in history)
+
+    def _output(self, response):
+        if not isinstance(response, dict) or "output" not in response:
+            return str(response)
+        # An AgentExecutor run that was cut off or saw its tool fail answers without grounding
+        steps = response.get("intermediate_steps") or []
+        max_iterations = getattr(self.inner, "max_iterations", None)
+        if (max_iterations is not None and len(steps) >= max_iterations) \
+                or any(isinstance(observation, FailedAnswer) for _, observation in steps):
+            return FailedAnswer(response["output"])
+        return response["output"]
+
+    def _inner_stream(self, inputs):
+        if getattr(self.inner, "streams_tokens", False):
+            yield from self.inner.stream(inputs)
+            return
+        yield self._output(self.inner.invoke(inputs))
+
+    async def _inner_astream(self, inputs):
+        if getattr(self.inner, "streams_tokens", False):
+            async for token in self.inner.astream(inputs):
+                yield token
+            return
+        yield self._output(await self.inner.ainvoke(inputs))
+
+    def invoke(self, inputs):
+        return {"input": inputs["input"], "output": "".join(self.stream(inputs))}
+
+    async def ainvoke(self, inputs):
+        return {"input": inputs["input"], "output": "".join([token async for token in self.astream(inputs)])}
+
+    def stream(self, inputs):
+        if not self._cacheable(inputs):
+            yield from self._inner_stream(inputs)
+            return
+        answer, embedding = self.cache.lookup(self.video_ids, self.model_name, inputs["input"])
+        if answer is not None:
+            yield answer
+            return
+        # An exception out of the inner stream skips the store as well
+        tokens = []
+        for token in self._inner_stream(inputs):
+            tokens.append(token)
+            yield token
+        if not any(isinstance(token, FailedAnswer) for token in tokens):
+            self.cache.store(self.video_ids, self.model_name, inputs["input"], "".join(tokens), embedding)
+
+    async def astream(self, inputs):
+        if not self._cacheable(inputs):
+            async for token in self._inner_astream(inputs):
+                yield token
+            return
+        # Lookups and stores embed the question and hit SQLite; keep both off the event loop
+        answer, embedding = await asyncio.to_thread(self.cache.lookup, self.video_ids, self.model_name, inputs["input"])
+        if answer is not None:
+            yield answer
+            return
+        tokens = []
+        async for token in self._inner_astream(inputs):
+            tokens.append(token)
+            yield token
+        if not any(isinstance(token, FailedAnswer) for token in tokens):
+            await asyncio.to_thread(
+                self.cache.store, self.video_ids, self.model_name, inputs["input"], "".join(tokens), embedding
+            )
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Return the process-wide answer cache configured in config.yaml."""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            # Imported here to keep this module light for callers that pass their own embeddings
+            from tools.embeddings import get_embeddings
+            _answer_cache = AnswerCache(
+                get_setting("answer_cache.path", "cache/answers.sqlite3"),
+                embeddings=get_embeddings(),
+                threshold=get_setting("answer_cache.threshold", 0.92),
+                ttl=get_setting("answer_cache.ttl", 86400),
+                max_entries=get_setting("answer_cache.max_entries", 5000),
+            )
+    return _answer_cache
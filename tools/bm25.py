@@ -0,0 +1,91 @@
+import math
+import re
+import threading
+from collections import Counter
+
+from tools.metadata_filter import matches_filter
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Lower-cased word and number tokens; no stemming so names match exactly."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """In-process BM25 inverted index over transcript chunks.
+
+    Documents are added incrementally (re-adding an id is a no-op) and held
+    as integer postings: term -> {doc number: term frequency}.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_ids = []
+        self._texts = []
+        self._metadatas = []
+        self._lengths = []
+        self._numbers = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._numbers
+
+    def add(self, doc_id, text, metadata=None):
+        """Index one chunk under ``doc_id``."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self._numbers:
+                return
+            number = len(self._doc_ids)
+            self._numbers[doc_id] = number
+            self._doc_ids.append(doc_id)
+            self._texts.append(text)
+            self._metadatas.append(metadata or {})
+            length = sum(terms.values())
+            self._lengths.append(length)
+            self._total_length += length
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[number] = frequency
+
+    def set_metadata(self, doc_id, metadata):
+        """Replace the metadata filters see for an indexed chunk."""
+        with self._lock:
+            number = self._numbers.get(doc_id)
+            if number is not None:
+                self._metadatas[number] = metadata or {}
+
+    def search(self, query, k=10, where=None):
+        """Return up to ``k`` ``(doc_id, text, metadata, score)`` tuples, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._doc_ids)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for number, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[number] / average_length)
+                    scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for number, score in ranked:
+                if where and not matches_filter(self._metadatas[number], where):
+                    continue
+                results.append((self._doc_ids[number], self._texts[number], self._metadatas[number], score))
+                if len(results) == k:
+                    break
+            return results
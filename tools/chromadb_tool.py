@@ -1,49 +1,360 @@
 # tools/chromadb_tool.py
 
-# Use LangChain's tools instead of LangGraph
-from langchain.tools import Tool
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
+import asyncio
+import hashlib
+import os
+import re
+import threading
+
+from config import get_setting
+from tools.bm25 import BM25Index
+from tools.dedup import SOURCES_KEY, merge_references, video_flag
+from tools.metrics import count_items, timed
+from tools.utils import extract_video_id
+
+
+def embedding_model_name(embeddings):
+    """Return a stable name for the model behind an embeddings object."""
+    for attr in ("model", "model_name"):
+        name = getattr(embeddings, attr, None)
+        if isinstance(name, str) and name:
+            return name
+    return type(embeddings).__name__
+
+
+def document_video_id(document):
+    """Return the video id a chunk belongs to, falling back to its source."""
+    metadata = document.metadata or {}
+    if metadata.get("video_id"):
+        return metadata["video_id"]
+    source = metadata.get("source", "")
+    return extract_video_id(source) or source
+
+
+def chunk_id(video_id, text, model_name):
+    """Content address of a chunk: sha256 over video id, chunk text and model."""
+    digest = hashlib.sha256()
+    for part in (video_id, text, model_name):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+# Every video is indexed once into this long-lived collection; sessions
+# select their videos with a metadata filter instead of a collection each
+CORPUS_COLLECTION = "video_corpus"
+
+# Open stores shared by every session in the process, keyed by (collection, model, backend)
+_vector_stores = {}
+_vector_stores_lock = threading.Lock()
+
+
+def get_vector_store(collection_name=CORPUS_COLLECTION):
+    """Return the persistent store for a collection, opened once per process.
+
+    ``vector_store.backend`` in config.yaml picks Chroma (the default) or the
+    in-process NumPy flat index, which suits small and medium corpora;
+    ``vector_store.quantization`` shrinks the NumPy index to float16 or int8.
+    """
+    # Create embeddings with the provider configured in config.yaml
+    # Imported here: the embedding stack pulls in langchain_core and the model backend
+    from tools.embeddings import get_embeddings
+    embeddings = get_embeddings()
+    model_name = embedding_model_name(embeddings)
+
+    # Make collection name safe for ChromaDB (alphanumeric and underscores only)
+    safe_collection_name = re.sub(r'[^a-zA-Z0-9_]', '_', collection_name)
+
+    # Vectors from different models can't share a collection, so key it by model
+    model_slug = re.sub(r'[^a-zA-Z0-9_]', '_', model_name)
+    model_collection_name = f"{safe_collection_name}_{model_slug}"[:63]
+
+    backend = get_setting("vector_store.backend", "chroma")
+    key = (safe_collection_name, model_name, backend)
+    with _vector_stores_lock:
+        if key not in _vector_stores and backend == "numpy":
+            from tools.numpy_store import NumpyVectorStore
+            directory = os.path.join(get_setting("vector_store.numpy_dir", "cache/vectors"), model_collection_name)
+            _vector_stores[key] = NumpyVectorStore(
+                model_collection_name, embeddings, directory=directory,
+                quantization=get_setting("vector_store.quantization", "float32"),
+                rescore_factor=get_setting("vector_store.rescore_factor", 4),
+            )
+        elif key not in _vector_stores:
+            # Create a separate directory for each collection
+            db_path = f"./db/{safe_collection_name}"
+            os.makedirs(db_path, exist_ok=True)
+            # Imported on first use: chromadb is slow to import
+            from langchain_community.vectorstores import Chroma
+            _vector_stores[key] = Chroma(
+                collection_name=model_collection_name,
+                embedding_function=embeddings,
+                persist_directory=db_path
+            )
+        return _vector_stores[key]
+
+
+def video_filter(video_ids):
+    """Chroma ``where`` filter restricting a search to the given videos.
+
+    Also matches chunks kept in place of a near-duplicate from one of these
+    videos, which carry a flag per such video (see ``tools.dedup``).
+    """
+    video_ids = sorted(set(video_ids))
+    if len(video_ids) == 1:
+        own = {"video_id": video_ids[0]}
+    else:
+        own = {"video_id": {"$in": video_ids}}
+    return {"$or": [own] + [{video_flag(video_id): True} for video_id in video_ids]}
+
+
+_index_markers = None
+_index_markers_lock = threading.Lock()
+
+
+def get_index_markers():
+    """Return the process-wide record of completely indexed videos."""
+    global _index_markers
+    with _index_markers_lock:
+        if _index_markers is None:
+            from tools.index_markers import IndexMarkers
+            _index_markers = IndexMarkers(get_setting("vector_store.markers_path", "cache/indexed_videos.sqlite3"))
+    return _index_markers
+
+
+def _marker_store(vector_store):
+    return f"{get_setting('vector_store.backend', 'chroma')}:{store_name(vector_store)}"
+
+
+def mark_videos_indexed(video_ids, collection_name=CORPUS_COLLECTION):
+    """Record that every chunk of these videos is in the collection.
+
+    Call only once their chunks (and the chunks kept in place of their
+    duplicates) have been stored.
+    """
+    get_index_markers().mark(_marker_store(get_vector_store(collection_name)), video_ids)
+
+
+def indexed_video_ids(video_ids, collection_name=CORPUS_COLLECTION):
+    """Return the subset of video ids completely indexed in the collection.
+
+    A video counts once ``mark_videos_indexed`` recorded it, so a partial
+    add (crashed, or still being written by another session) is ingested
+    again. Its rows must still be there, in case the store was wiped.
+    """
+    vector_store = get_vector_store(collection_name)
+    return {
+        video_id for video_id in get_index_markers().marked(_marker_store(vector_store), video_ids)
+        if vector_store.get(where=video_filter([video_id]), limit=1, include=[])["ids"]
+    }
+
+
+def store_name(vector_store):
+    """Name of the underlying collection, whichever backend holds it."""
+    name = getattr(vector_store, "name", None)
+    return name if isinstance(name, str) else vector_store._collection.name
+
+
+def _upsert(vector_store, ids, vectors, texts, metadatas):
+    if hasattr(vector_store, "upsert_vectors"):
+        vector_store.upsert_vectors(ids, vectors, texts, metadatas)
+    else:
+        vector_store._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+
+def search_by_vectors(vector_store, vectors, k, where=None):
+    """Nearest chunks for several query embeddings at once, one list per query.
+
+    The NumPy store scores all queries in one matrix product; Chroma takes
+    them in a single ``query`` call.
+    """
+    if hasattr(vector_store, "similarity_search_by_vectors"):
+        return [
+            [document for document, _ in hits]
+            for hits in vector_store.similarity_search_by_vectors(vectors, k, where)
+        ]
+    from langchain_core.documents import Document
+    results = vector_store._collection.query(
+        query_embeddings=[list(vector) for vector in vectors], n_results=k, where=where,
+        include=["documents", "metadatas"],
+    )
+    return [
+        [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        for texts, metadatas in zip(results["documents"], results["metadatas"])
+    ]
+
+
+def _update_metadatas(vector_store, ids, metadatas):
+    if hasattr(vector_store, "update_metadatas"):
+        vector_store.update_metadatas(ids, metadatas)
+    else:
+        vector_store._collection.update(ids=ids, metadatas=metadatas)
+
+
+# BM25 indexes over the same chunks, per collection, and the videos loaded into each
+_bm25_indexes = {}
+_bm25_videos = {}
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_index(vector_store, video_ids):
+    """Return the collection's BM25 index, loading any of these videos it lacks."""
+    name = store_name(vector_store)
+    with _bm25_lock:
+        index = _bm25_indexes.setdefault(name, BM25Index())
+        loaded = _bm25_videos.setdefault(name, set())
+        missing = sorted(set(video_ids) - loaded)
+        if missing:
+            stored = vector_store.get(where=video_filter(missing), include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                index.add(doc_id, text, metadata)
+            loaded.update(missing)
+    return index
+
+
+def _index_bm25(vector_store, ids, documents):
+    # Keep an already-built BM25 index in step with newly stored chunks
+    with _bm25_lock:
+        index = _bm25_indexes.get(store_name(vector_store))
+    if index is not None:
+        for doc_id, document in zip(ids, documents):
+            if doc_id in index:
+                index.set_metadata(doc_id, document.metadata)
+            else:
+                index.add(doc_id, document.page_content, document.metadata)
+
+
+def get_retriever(vector_store, video_ids, k=None):
+    """Retriever over the given videos: hybrid BM25 + vector, or vector only."""
+    if k is None:
+        k = get_setting("retrieval.k", 8)
+    where = video_filter(video_ids)
+    if not get_setting("retrieval.hybrid", True):
+        return vector_store.as_retriever(search_kwargs={"k": k, "filter": where})
+    from tools.hybrid_retriever import HybridRetriever
+    return HybridRetriever(
+        vector_store=vector_store,
+        bm25_index=get_bm25_index(vector_store, video_ids),
+        k=k,
+        candidate_k=get_setting("retrieval.candidate_k", 20),
+        rrf_k=get_setting("retrieval.rrf_k", 60),
+        where=where,
+    )
+
 
 # Assuming you have functions for embeddings and storing vectors
-def store_embeddings(documents, collection_name=None):
-    """Store document embeddings in ChromaDB."""
-    # Create embeddings
-    embeddings = OpenAIEmbeddings()
-    
+def store_embeddings(documents, collection_name=None, incremental=True):
+    """Store document embeddings in ChromaDB.
+
+    With ``incremental`` (the default) the persistent collection is kept and
+    only chunks whose content hash is not already stored get embedded.
+    Pass ``incremental=False`` to drop the collection and rebuild it.
+    """
     # If no collection name is provided, use a default
     if collection_name is None:
         collection_name = "default_collection"
-    
-    # Make collection name safe for ChromaDB (alphanumeric and underscores only)
-    import re
-    import os
-    import shutil
-    
-    safe_collection_name = re.sub(r'[^a-zA-Z0-9_]', '_', collection_name)
-    
-    # Create a separate directory for each collection
-    db_path = f"./db/{safe_collection_name}"
-    
-    # Remove the directory if it exists
-    if os.path.exists(db_path):
-        try:
-            shutil.rmtree(db_path)
-            print(f"Removed existing database at {db_path}")
-        except Exception as e:
-            print(f"Warning: Could not remove existing database: {e}")
-    
-    # Ensure the directory exists
-    os.makedirs(db_path, exist_ok=True)
-    
-    # Create a new vector store in the dedicated directory
-    vector_store = Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
-        collection_name=safe_collection_name,
-        persist_directory=db_path
-    )
-    
+
+    vector_store = get_vector_store(collection_name)
+    model_name = embedding_model_name(vector_store.embeddings)
+
+    # Drop the collection if we are rebuilding from scratch
+    if not incremental:
+        with _vector_stores_lock:
+            try:
+                get_index_markers().clear(_marker_store(vector_store))
+                vector_store.delete_collection()
+                print(f"Removed existing collection {store_name(vector_store)}")
+            except Exception as e:
+                print(f"Warning: Could not remove existing collection: {e}")
+            backend = get_setting("vector_store.backend", "chroma")
+            _vector_stores.pop((re.sub(r'[^a-zA-Z0-9_]', '_', collection_name), model_name, backend), None)
+        vector_store = get_vector_store(collection_name)
+
+    new_documents, new_ids, stored = _new_chunks(vector_store, documents, model_name)
+    _merge_stored_references(vector_store, documents, model_name)
+
+    # Only embed and upsert the delta; ids are content hashes, so concurrent
+    # sessions adding the same chunk write the same row
+    if new_ids:
+        texts = [doc.page_content for doc in new_documents]
+        with timed("embed", chunks=len(texts)):
+            vectors = vector_store.embeddings.embed_documents(texts)
+        with timed("upsert", chunks=len(texts)):
+            _upsert(vector_store, new_ids, vectors, texts, [doc.metadata for doc in new_documents])
+        _index_bm25(vector_store, new_ids, new_documents)
+    count_items("embed", len(new_ids))
+    print(f"Indexed {len(new_ids)} new chunks in {store_name(vector_store)} ({stored} already stored)")
+
+    return vector_store
+
+
+def _new_chunks(vector_store, documents, model_name):
+    """Return the documents (and their ids) not yet in the store, plus the stored count."""
+    # Address every chunk by its content so re-submits map to the same ids
+    ids_by_document = {}
+    for document in documents:
+        doc_id = chunk_id(document_video_id(document), document.page_content, model_name)
+        ids_by_document.setdefault(doc_id, document)
+
+    ids = list(ids_by_document)
+    existing = set()
+    if ids:
+        existing = set(vector_store.get(ids=ids, include=[])["ids"])
+
+    new_ids = [doc_id for doc_id in ids if doc_id not in existing]
+    return [ids_by_document[doc_id] for doc_id in new_ids], new_ids, len(existing)
+
+
+def _merge_stored_references(vector_store, documents, model_name):
+    """Add the duplicate references of already-stored chunks to their rows.
+
+    A chunk kept by deduplication may already be in the store from an
+    earlier ingest; its row gains the new videos' flags and sources.
+    """
+    referenced = {}
+    for document in documents:
+        if SOURCES_KEY in (document.metadata or {}):
+            doc_id = chunk_id(document_video_id(document), document.page_content, model_name)
+            referenced[doc_id] = document
+    if not referenced:
+        return
+
+    from langchain_core.documents import Document
+    stored = vector_store.get(ids=list(referenced), include=["metadatas"])
+    ids, merged = [], []
+    for doc_id, metadata in zip(stored["ids"], stored["metadatas"]):
+        metadata = dict(metadata or {})
+        if merge_references(metadata, referenced[doc_id].metadata):
+            ids.append(doc_id)
+            merged.append(Document(page_content=referenced[doc_id].page_content, metadata=metadata))
+    if ids:
+        _update_metadatas(vector_store, ids, [document.metadata for document in merged])
+        _index_bm25(vector_store, ids, merged)
+
+
+async def astore_embeddings(documents, collection_name=CORPUS_COLLECTION):
+    """Async, incremental ``store_embeddings``.
+
+    Embeds the new chunks through the provider's ``aembed_documents`` and
+    runs the blocking Chroma calls in a worker thread.
+    """
+    vector_store = await asyncio.to_thread(get_vector_store, collection_name)
+    model_name = embedding_model_name(vector_store.embeddings)
+    new_documents, new_ids, stored = await asyncio.to_thread(_new_chunks, vector_store, documents, model_name)
+    await asyncio.to_thread(_merge_stored_references, vector_store, documents, model_name)
+
+    if new_ids:
+        texts = [doc.page_content for doc in new_documents]
+        with timed("embed", chunks=len(texts)):
+            vectors = await vector_store.embeddings.aembed_documents(texts)
+        with timed("upsert", chunks=len(texts)):
+            await asyncio.to_thread(
+                _upsert, vector_store, new_ids, vectors, texts, [doc.metadata for doc in new_documents]
+            )
+        _index_bm25(vector_store, new_ids, new_documents)
+    count_items("embed", len(new_ids))
+    print(f"Indexed {len(new_ids)} new chunks in {store_name(vector_store)} ({stored} already stored)")
+
     return vector_store
 
 # Function to query ChromaDB for relevant chunks
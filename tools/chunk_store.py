@@ -0,0 +1,201 @@
+import json
+import math
+import mmap
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from config import get_setting
+from tools.file_lock import file_lock
+
+# One fixed-size row per chunk; the text itself lives in chunks.dat
+ROW_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("chunk_index", "<u4"),
+    ("start", "<f8"),
+    ("end", "<f8"),
+])
+
+
+class ChunkStore:
+    """Columnar on-disk store of chunked transcripts, shared by every ingest path.
+
+    Chunk texts are appended as UTF-8 to ``chunks.dat`` and read back by
+    slicing a memory map of it. ``chunks.idx`` holds one fixed-size
+    ``ROW_DTYPE`` row per chunk (byte offset, length, chunk index, start,
+    end) and ``manifest.json`` maps each video to its run of rows and the
+    chunking settings it was cut with. Opening the store only reads the
+    manifest, so startup cost does not grow with the number of videos.
+
+    The manifest is replaced atomically after the data and index appends,
+    so a crash mid-append leaves trailing bytes that are truncated by the
+    next ``put``. Puts hold an exclusive ``flock`` on the directory and
+    readers re-read the manifest when it changes, so several processes
+    can share the store.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._version = None
+        self._data = None
+        self._rows = None
+
+    @property
+    def _data_path(self):
+        return os.path.join(self.directory, "chunks.dat")
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.directory, "chunks.idx")
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def _load(self):
+        """Read the manifest, again whenever another put has replaced it."""
+        try:
+            stat = os.stat(self._manifest_path)
+            version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            version = None
+        if self._manifest is not None and version == self._version:
+            return
+        self._version = version
+        self._close_maps()
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+        except (OSError, ValueError):
+            self._manifest = {"rows": 0, "data_bytes": 0, "videos": {}}
+
+    def _truncate(self):
+        # Drop anything appended after the last manifest write (all of it if none was
+        # written); only safe with the file lock held
+        for path, size in ((self._data_path, self._manifest["data_bytes"]),
+                           (self._index_path, self._manifest["rows"] * ROW_DTYPE.itemsize)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _close_maps(self):
+        if self._data is not None:
+            self._data.close()
+        self._data = self._rows = None
+
+    def _maps(self):
+        """Memory-map the data and index files (once per append)."""
+        if self._data is None and self._manifest["rows"]:
+            with open(self._data_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._rows = np.memmap(self._index_path, dtype=ROW_DTYPE, mode="r",
+                                   shape=(self._manifest["rows"],))
+        return self._data, self._rows
+
+    def __contains__(self, video_id):
+        with self._lock:
+            self._load()
+            return video_id in self._manifest["videos"]
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._manifest["videos"])
+
+    def get(self, video_id, chunking=None):
+        """Return a video's chunks as ``{page_content, metadata}`` dicts, or None.
+
+        With ``chunking`` (``(chunk_size, chunk_overlap)``), chunks cut with
+        other settings count as a miss.
+        """
+        with self._lock:
+            self._load()
+            entry = self._manifest["videos"].get(video_id)
+            if entry is None or (chunking is not None and entry["chunking"] != list(chunking)):
+                return None
+            if not entry["count"]:
+                return []
+            data, rows = self._maps()
+            run = rows[entry["row"]:entry["row"] + entry["count"]]
+            documents = []
+            with memoryview(data) as view:
+                for offset, length, chunk_index, start, end in run.tolist():
+                    metadata = {"source": entry["source"], "video_id": video_id, "chunk_index": chunk_index}
+                    if not math.isnan(start):
+                        metadata["start"] = start
+                    if not math.isnan(end):
+                        metadata["end"] = end
+                    # Decode straight from the map, without an intermediate bytes copy
+                    text = str(view[offset:offset + length], "utf-8")
+                    documents.append({"page_content": text, "metadata": metadata})
+            return documents
+
+    def put(self, video_id, source, documents, chunking=None):
+        """Append a video's chunks and point the manifest at them.
+
+        Re-putting a video (e.g. after the chunk size changed) appends a new
+        run; the old one stays in the files but is no longer referenced.
+        """
+        texts = [document["page_content"].encode("utf-8") for document in documents]
+        with self._lock, file_lock(self.directory):
+            self._load()
+            self._truncate()
+            rows = np.zeros(len(texts), dtype=ROW_DTYPE)
+            offset = self._manifest["data_bytes"]
+            for i, (text, document) in enumerate(zip(texts, documents)):
+                metadata = document["metadata"]
+                rows[i] = (offset, len(text), metadata.get("chunk_index", i),
+                           metadata.get("start", math.nan), metadata.get("end", math.nan))
+                offset += len(text)
+
+            # Close the maps before growing the files (required on Windows)
+            self._close_maps()
+            with open(self._data_path, "ab") as f:
+                f.write(b"".join(texts))
+            with open(self._index_path, "ab") as f:
+                f.write(rows.tobytes())
+
+            self._manifest["videos"][video_id] = {
+                "source": source,
+                "row": self._manifest["rows"],
+                "count": len(texts),
+                "chunking": list(chunking) if chunking is not None else None,
+            }
+            self._manifest["rows"] += len(texts)
+            self._manifest["data_bytes"] = offset
+            self._write_manifest()
+
+    def _write_manifest(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._manifest, f)
+            os.replace(tmp_path, self._manifest_path)
+            stat = os.stat(self._manifest_path)
+            self._version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def current_chunking():
+    """The ``(chunk_size, chunk_overlap)`` new chunks are cut with."""
+    return (get_setting("retrieval.chunk_size", 300), get_setting("retrieval.chunk_overlap", 0))
+
+
+_chunk_store = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store():
+    """Return the process-wide chunk store configured in config.yaml."""
+    global _chunk_store
+    with _chunk_store_lock:
+        if _chunk_store is None:
+            _chunk_store = ChunkStore(get_setting("cache.chunks_dir", "cache/chunks"))
+    return _chunk_store
@@ -0,0 +1,127 @@
+from config import get_setting
+from tools.utils import extract_video_id
+
+_encoder = None
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when available, else approximate from words."""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text))
+    # Roughly 4 tokens for every 3 English words
+    return max(1, (len(text.split()) * 4 + 2) // 3) if text.strip() else 0
+
+
+def normalize_segments(transcript):
+    """Turn a cached transcript into a list of {text, start, duration} segments.
+
+    Older cache entries are plain strings; those come back without timing.
+    """
+    segments = []
+    for item in transcript:
+        if isinstance(item, str):
+            segments.append({"text": item, "start": None, "duration": None})
+        else:
+            segments.append({
+                "text": item.get("text", ""),
+                "start": item.get("start"),
+                "duration": item.get("duration"),
+            })
+    return segments
+
+
+def _split_long_segment(segment, chunk_size):
+    """Split a segment that alone exceeds the token budget into word runs."""
+    words = segment["text"].split()
+    pieces, current = [], []
+    for word in words:
+        current.append(word)
+        if count_tokens(" ".join(current)) > chunk_size and len(current) > 1:
+            current.pop()
+            pieces.append(" ".join(current))
+            current = [word]
+    if current:
+        pieces.append(" ".join(current))
+    return [{**segment, "text": piece} for piece in pieces]
+
+
+def chunk_segments(segments, chunk_size, chunk_overlap=0):
+    """Group consecutive segments into chunks of at most ``chunk_size`` tokens.
+
+    Each chunk after the first starts with the trailing segments of the
+    previous one, up to ``chunk_overlap`` tokens. Returns dicts with the
+    chunk text and the start/end offsets (seconds) of the segments it covers.
+    """
+    units = []
+    for segment in segments:
+        if not segment["text"].strip():
+            continue
+        tokens = count_tokens(segment["text"])
+        if tokens > chunk_size:
+            for piece in _split_long_segment(segment, chunk_size):
+                units.append((piece, count_tokens(piece["text"])))
+        else:
+            units.append((segment, tokens))
+
+    chunks = []
+    i = 0
+    while i < len(units):
+        # Greedily take segments until the budget is spent
+        j, total = i, 0
+        while j < len(units) and (j == i or total + units[j][1] <= chunk_size):
+            total += units[j][1]
+            j += 1
+        window = [unit for unit, _ in units[i:j]]
+
+        start = window[0]["start"]
+        last = window[-1]
+        end = None
+        if last["start"] is not None:
+            end = last["start"] + (last["duration"] or 0)
+        chunks.append({
+            "text": " ".join(unit["text"] for unit in window),
+            "start": start,
+            "end": end,
+        })
+        if j >= len(units):
+            break
+
+        # Step back over trailing segments to build the overlap, always advancing
+        next_i, overlap = j, 0
+        while next_i - 1 > i and overlap + units[next_i - 1][1] <= chunk_overlap:
+            next_i -= 1
+            overlap += units[next_i][1]
+        i = next_i
+    return chunks
+
+
+def chunk_transcript(url, transcript, chunk_size=None, chunk_overlap=None):
+    """Chunk one video's transcript into ``{page_content, metadata}`` dicts.
+
+    Sizes default to ``retrieval.chunk_size`` / ``retrieval.chunk_overlap``
+    (in tokens) from config.yaml. Metadata carries the source url, video id,
+    chunk index and, when the transcript has timing, start/end in seconds.
+    """
+    if chunk_size is None:
+        chunk_size = get_setting("retrieval.chunk_size", 300)
+    if chunk_overlap is None:
+        chunk_overlap = get_setting("retrieval.chunk_overlap", 0)
+    video_id = extract_video_id(url) or url
+
+    documents = []
+    for index, chunk in enumerate(chunk_segments(normalize_segments(transcript), chunk_size, chunk_overlap)):
+        metadata = {"source": url, "video_id": video_id, "chunk_index": index}
+        # Chroma metadata can't hold None, so only record known offsets
+        if chunk["start"] is not None:
+            metadata["start"] = float(chunk["start"])
+        if chunk["end"] is not None:
+            metadata["end"] = float(chunk["end"])
+        documents.append({"page_content": chunk["text"], "metadata": metadata})
+    return documents
@@ -1,7 +1,20 @@
 import os
+import shutil
 
-if os.path.exists("transcript_cache.json"):
-    os.remove("transcript_cache.json")
+from tools.transcript_store import LEGACY_CACHE_FILE, get_transcript_store
+
+store_dir = get_transcript_store().directory
+cleared = False
+
+if os.path.isdir(store_dir):
+    shutil.rmtree(store_dir)
+    cleared = True
+
+if os.path.exists(LEGACY_CACHE_FILE):
+    os.remove(LEGACY_CACHE_FILE)
+    cleared = True
+
+if cleared:
     print("Transcript cache cleared.")
 else:
     print("No transcript cache found.")
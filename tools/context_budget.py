@@ -0,0 +1,219 @@
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from config import get_setting
+from tools.chunking import count_tokens
+from tools.metrics import timed
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut ``text`` down to at most ``max_tokens`` tokens on a word boundary."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    # Binary search for the longest word prefix that fits
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low])
+
+
+def _join_overlapping(first, second, max_overlap=200):
+    """Concatenate two texts, dropping the words ``second`` repeats from the end of ``first``."""
+    a, b = first.split(), second.split()
+    for size in range(min(len(a), len(b), max_overlap), 0, -1):
+        if a[-size:] == b[:size]:
+            return " ".join(a + b[size:])
+    return " ".join(a + b)
+
+
+def _is_adjacent(previous, document):
+    prev_meta, meta = previous.metadata or {}, document.metadata or {}
+    if prev_meta.get("video_id") is None or prev_meta.get("video_id") != meta.get("video_id"):
+        return False
+    last = prev_meta.get("last_chunk_index", prev_meta.get("chunk_index"))
+    return last is not None and meta.get("chunk_index") == last + 1
+
+
+def merge_chunks(documents):
+    """Deduplicate retrieved chunks and merge neighbours from the same video.
+
+    Exact duplicates and chunks contained in another retrieved chunk are dropped.
+    Chunks with consecutive ``chunk_index`` in one video are joined into a
+    single passage without their shared overlap. Passages keep the rank
+    of their best chunk.
+    """
+    unique = []
+    for document in documents:
+        text = document.page_content
+        if any(text in kept.page_content for kept in unique):
+            continue
+        # A longer chunk replaces the ones it contains, at the best of their ranks
+        contained = [i for i, kept in enumerate(unique) if kept.page_content in text]
+        if contained:
+            unique[contained[0]] = document
+            unique = [kept for i, kept in enumerate(unique) if i not in contained[1:]]
+        else:
+            unique.append(document)
+
+    # Walk each video's chunks in transcript order, remembering each passage's best rank
+    rank = {id(document): position for position, document in enumerate(unique)}
+    ordered = sorted(
+        unique,
+        key=lambda d: (str((d.metadata or {}).get("video_id")), (d.metadata or {}).get("chunk_index", -1), rank[id(d)]),
+    )
+    passages = []
+    for document in ordered:
+        if passages and _is_adjacent(passages[-1][1], document):
+            best, previous = passages[-1]
+            metadata = {**previous.metadata, "last_chunk_index": document.metadata["chunk_index"]}
+            if "end" in document.metadata:
+                metadata["end"] = document.metadata["end"]
+            merged = Document(
+                page_content=_join_overlapping(previous.page_content, document.page_content),
+                metadata=metadata,
+            )
+            passages[-1] = (min(best, rank[id(document)]), merged)
+        else:
+            passages.append((rank[id(document)], document))
+    return [document for _, document in sorted(passages, key=lambda item: item[0])]
+
+
+def fit_to_budget(documents, max_tokens):
+    """Keep passages in rank order until ``max_tokens`` is spent.
+
+    A passage that no longer fits is truncated if a useful amount of the
+    budget is left, otherwise skipped in favour of shorter ones after it.
+    """
+    kept, used = [], 0
+    for document in documents:
+        remaining = max_tokens - used
+        if remaining <= 0:
+            break
+        tokens = count_tokens(document.page_content)
+        if tokens > remaining:
+            if remaining < min(50, max_tokens // 4):
+                continue
+            document = Document(
+                page_content=truncate_to_tokens(document.page_content, remaining),
+                metadata=document.metadata,
+            )
+            tokens = count_tokens(document.page_content)
+        kept.append(document)
+        used += tokens
+    return kept
+
+
+def assemble_context(documents, max_tokens):
+    """Deduplicate, merge and trim retrieved chunks to a token budget."""
+    return fit_to_budget(merge_chunks(documents), max_tokens)
+
+
+def _turn_text(turn):
+    if isinstance(turn, dict):
+        return str(turn.get("content", ""))
+    if isinstance(turn, (tuple, list)) and len(turn) == 2:
+        return str(turn[1])
+    return str(getattr(turn, "content", turn))
+
+
+def _with_text(turn, text):
+    if isinstance(turn, dict):
+        return {**turn, "content": text}
+    if isinstance(turn, (tuple, list)) and len(turn) == 2:
+        return (turn[0], text)
+    if hasattr(turn, "content"):
+        return turn.model_copy(update={"content": text})
+    return text
+
+
+def trim_history(conversation_history, max_tokens, max_turn_tokens=None):
+    """Keep the most recent turns that fit in ``max_tokens``.
+
+    Older turns are dropped whole; any single turn longer than
+    ``max_turn_tokens`` (default: the full budget) is truncated first, so
+    the latest exchange always survives.
+    """
+    if max_turn_tokens is None:
+        max_turn_tokens = max_tokens
+    kept, used = [], 0
+    for turn in reversed(conversation_history or []):
+        text = _turn_text(turn)
+        tokens = count_tokens(text)
+        if tokens > max_turn_tokens:
+            turn = _with_text(turn, truncate_to_tokens(text, max_turn_tokens))
+            tokens = count_tokens(_turn_text(turn))
+        if used + tokens > max_tokens:
+            break
+        kept.append(turn)
+        used += tokens
+    kept.reverse()
+    return kept
+
+
+def context_budget(model_name=None):
+    """Tokens of retrieved context allowed in one prompt for ``model_name``."""
+    budgets = get_setting("context.model_budgets", {}) or {}
+    if model_name in budgets:
+        return budgets[model_name]
+    return get_setting("context.max_tokens", 3000)
+
+
+def budget_history(conversation_history):
+    """Trim a conversation to the ``context.history_tokens`` budget from config.yaml."""
+    return trim_history(
+        conversation_history,
+        get_setting("context.history_tokens", 1000),
+        get_setting("context.max_turn_tokens", 400),
+    )
+
+
+class BudgetedRetriever(BaseRetriever):
+    """Wrap a retriever so the chunks it returns fit in ``max_tokens``.
+
+    Overlapping and duplicate chunks are collapsed, neighbours from the
+    same video are merged and the result is cut to the budget, so the
+    "stuff" prompt stays bounded whatever ``k`` and the chunk size are.
+    """
+
+    retriever: Any
+    max_tokens: int = 3000
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with timed("retrieve") as fields:
+            documents = assemble_context(self.retriever.invoke(query), self.max_tokens)
+            fields["documents"] = len(documents)
+        return documents
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        with timed("retrieve") as fields:
+            documents = assemble_context(await self.retriever.ainvoke(query), self.max_tokens)
+            fields["documents"] = len(documents)
+        return documents
+
+    def retrieve_by_vectors(self, queries, vectors):
+        """Budgeted retrieval for many queries with precomputed embeddings.
+
+        Uses the wrapped retriever's batched search where it has one (the
+        hybrid retriever, or a plain vector store retriever); otherwise
+        falls back to ``batch``.
+        """
+        with timed("retrieve_batch", queries=len(queries)) as fields:
+            if hasattr(self.retriever, "retrieve_by_vectors"):
+                results = self.retriever.retrieve_by_vectors(queries, vectors)
+            elif hasattr(self.retriever, "vectorstore") and self.retriever.search_type == "similarity":
+                from tools.chromadb_tool import search_by_vectors
+                search_kwargs = self.retriever.search_kwargs
+                results = search_by_vectors(self.retriever.vectorstore, vectors,
+                                            search_kwargs.get("k", 4), search_kwargs.get("filter"))
+            else:
+                results = self.retriever.batch(list(queries))
+            results = [assemble_context(documents, self.max_tokens) for documents in results]
+            fields["documents"] = sum(len(documents) for documents in results)
+        return results
@@ -0,0 +1,299 @@
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
+import numpy as np
+
+from config import get_setting
+from tools.bm25 import tokenize
+from tools.file_lock import file_lock
+
+# Largest prime below 2**32: hashes and coefficients stay under it, so
+# ``a * x + b`` never overflows uint64
+PRIME = 4294967291
+
+# Metadata on a kept chunk: one flag per other video whose near-duplicate it
+# replaced, plus every merged chunk's position as a JSON list
+FLAG_PREFIX = "in_video:"
+SOURCES_KEY = "duplicate_sources"
+SOURCE_FIELDS = ("video_id", "source", "chunk_index", "start", "end")
+
+
+def video_flag(video_id):
+    """Metadata key marking a chunk that also stands in for ``video_id``."""
+    return f"{FLAG_PREFIX}{video_id}"
+
+
+def shingle_hashes(text, size=3):
+    """Distinct hashes of the word ``size``-grams of ``text``."""
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        grams = {" ".join(tokens)} if tokens else set()
+    else:
+        grams = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) % PRIME for gram in grams), dtype=np.uint64,
+                       count=len(grams))
+
+
+class MinHasher:
+    """MinHash signatures from ``num_perm`` universal hash functions."""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes):
+        if not len(hashes):
+            return np.full(self.num_perm, PRIME, dtype=np.uint64)
+        return ((np.outer(hashes, self._a) + self._b) % PRIME).min(axis=0)
+
+
+def source_reference(metadata):
+    return {field: metadata[field] for field in SOURCE_FIELDS if field in metadata}
+
+
+def merge_references(metadata, other):
+    """Fold ``other`` (a duplicate chunk's metadata, or a stored copy of the
+    same chunk) into ``metadata``: video flags and source lists are unioned.
+
+    Returns True if ``metadata`` changed.
+    """
+    before = dict(metadata)
+    own_flag = video_flag(metadata.get("video_id"))
+    video_id = other.get("video_id")
+    if video_id is not None and video_id != metadata.get("video_id"):
+        metadata[video_flag(video_id)] = True
+    for key, value in other.items():
+        if key.startswith(FLAG_PREFIX) and key != own_flag:
+            metadata[key] = value
+
+    own = source_reference(metadata)
+    sources = json.loads(metadata.get(SOURCES_KEY, "[]"))
+    for reference in json.loads(other.get(SOURCES_KEY, "[]")) + [source_reference(other)]:
+        if reference != own and reference not in sources:
+            sources.append(reference)
+    if sources:
+        metadata[SOURCES_KEY] = json.dumps(sources)
+    return metadata != before
+
+
+def _same_chunk(document, other):
+    metadata, other_metadata = document.metadata or {}, other.metadata or {}
+    return (document.page_content == other.page_content
+            and metadata.get("video_id") == other_metadata.get("video_id")
+            and metadata.get("source") == other_metadata.get("source"))
+
+
+class SignatureIndex:
+    """MinHash signatures of kept chunks, bucketed by LSH band.
+
+    ``bands`` bands of ``num_perm / bands`` rows each; only chunks sharing
+    a band with a query are compared with it. With a ``directory`` the
+    index is kept on disk, append-only like the embedding cache:
+    signatures as raw uint32 rows in ``signatures.u32`` and each chunk's
+    text and metadata in ``chunks.jsonl``, so later ingests are checked
+    against every chunk kept before. ``locked`` holds an exclusive
+    ``flock`` on the directory and first picks up chunks other processes
+    added, so concurrent ingests also dedupe against each other.
+    """
+
+    def __init__(self, num_perm=128, bands=16, directory=None):
+        self.num_perm = num_perm
+        self.bands = bands
+        self.directory = directory
+        self.documents = []
+        self._lock = threading.Lock()
+        self._rows = num_perm // bands
+        self._signatures = []
+        self._buckets = {}
+        # Rows and chunks.jsonl bytes read from disk so far
+        self._stored = 0
+        self._stored_bytes = 0
+
+    @property
+    def _signatures_path(self):
+        return os.path.join(self.directory, "signatures.u32")
+
+    @property
+    def _chunks_path(self):
+        return os.path.join(self.directory, "chunks.jsonl")
+
+    @contextmanager
+    def locked(self):
+        """Hold the index (across processes with a ``directory``) and bring it up to date."""
+        with self._lock:
+            if not self.directory:
+                yield self
+                return
+            with file_lock(self.directory):
+                self._sync()
+                yield self
+
+    def _sync(self):
+        from langchain_core.documents import Document
+        signature_bytes = os.path.getsize(self._signatures_path) if os.path.exists(self._signatures_path) else 0
+        chunk_bytes = os.path.getsize(self._chunks_path) if os.path.exists(self._chunks_path) else 0
+        if signature_bytes < self._stored * self.num_perm * 4 or chunk_bytes < self._stored_bytes:
+            # The index was cleared underneath us
+            self.documents, self._signatures, self._buckets = [], [], {}
+            self._stored = self._stored_bytes = 0
+
+        count = signature_bytes // (self.num_perm * 4)
+        records, size = [], self._stored_bytes
+        if count > self._stored:
+            with open(self._chunks_path, "rb") as f:
+                f.seek(self._stored_bytes)
+                for line in f:
+                    if self._stored + len(records) == count or not line.endswith(b"\n"):
+                        break
+                    records.append(json.loads(line))
+                    size += len(line)
+        # Under the lock a mismatch means a crash between the two appends; trust the shorter file
+        count = self._stored + len(records)
+        for path, length in ((self._signatures_path, count * self.num_perm * 4), (self._chunks_path, size)):
+            if os.path.exists(path) and os.path.getsize(path) != length:
+                os.truncate(path, length)
+        if records:
+            signatures = np.fromfile(self._signatures_path, dtype=np.uint32, count=len(records) * self.num_perm,
+                                     offset=self._stored * self.num_perm * 4)
+            for row, record in enumerate(records):
+                self.add(signatures[row * self.num_perm:(row + 1) * self.num_perm],
+                         Document(page_content=record["text"], metadata=record["metadata"]))
+        self._stored, self._stored_bytes = count, size
+
+    def _keys(self, signature):
+        rows = self._rows
+        return [hash((band, signature[band * rows:(band + 1) * rows].tobytes())) for band in range(self.bands)]
+
+    def nearest(self, signature, threshold):
+        """Position of the most similar chunk at or above ``threshold``, or None."""
+        best, best_similarity = None, threshold
+        for candidate in sorted({index for key in self._keys(signature) for index in self._buckets.get(key, ())}):
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+                if similarity == 1.0:
+                    break
+        return best
+
+    def signature(self, position):
+        return self._signatures[position]
+
+    def add(self, signature, document):
+        """Index a chunk in memory and return its position."""
+        position = len(self.documents)
+        for key in self._keys(signature):
+            self._buckets.setdefault(key, []).append(position)
+        self._signatures.append(np.asarray(signature, dtype=np.uint32))
+        self.documents.append(document)
+        return position
+
+    def extend(self, signatures, documents):
+        """Index chunks and, with a ``directory``, append them to its files (inside ``locked``)."""
+        if self.directory and documents:
+            lines = "".join(
+                json.dumps({"text": document.page_content, "metadata": document.metadata}) + "\n"
+                for document in documents
+            ).encode("utf-8")
+            with open(self._signatures_path, "ab") as f:
+                f.write(np.asarray(signatures, dtype=np.uint32).tobytes())
+            with open(self._chunks_path, "ab") as f:
+                f.write(lines)
+            self._stored += len(documents)
+            self._stored_bytes += len(lines)
+        for signature, document in zip(signatures, documents):
+            self.add(signature, document)
+
+
+def dedupe_chunks(documents, threshold=0.8, num_perm=128, bands=16, shingle_size=3, index=None):
+    """Drop near-duplicate chunks, keeping the first of each group.
+
+    Chunks are MinHashed over word shingles and bucketed by LSH bands
+    (``bands`` bands of ``num_perm / bands`` rows), so only chunks sharing
+    a band are compared. A chunk whose estimated Jaccard similarity with an
+    earlier kept chunk is at least ``threshold`` is dropped and its source
+    (video, position) recorded on the kept chunk, flagged for its video so
+    that video's searches still find the content.
+
+    With an ``index`` (a ``SignatureIndex`` of chunks kept by earlier
+    ingests) chunks are also checked against it: a duplicate of a stored
+    chunk is dropped and a copy of the stored chunk, carrying the new
+    references, is kept in its place for ``store_embeddings`` to merge into
+    the stored row. Chunks kept for the first time are added to the index.
+
+    Returns ``(kept, dropped)``; kept documents are copies.
+    """
+    from langchain_core.documents import Document
+    hasher = MinHasher(num_perm)
+    batch = SignatureIndex(num_perm, bands)
+    stand_ins, fresh = {}, []
+    dropped = 0
+    with index.locked() if index is not None else nullcontext():
+        for document in documents:
+            signature = hasher.signature(shingle_hashes(document.page_content, shingle_size)).astype(np.uint32)
+            copy = Document(page_content=document.page_content, metadata=dict(document.metadata or {}))
+            best = batch.nearest(signature, threshold)
+
+            if best is None and index is not None:
+                stored = index.nearest(signature, threshold)
+                if stored is not None and _same_chunk(index.documents[stored], document):
+                    # The chunk itself, ingested again
+                    batch.add(signature, copy)
+                    continue
+                if stored is not None:
+                    best = stand_ins.get(stored)
+                    if best is None:
+                        original = index.documents[stored]
+                        best = stand_ins[stored] = batch.add(
+                            index.signature(stored),
+                            Document(page_content=original.page_content, metadata=dict(original.metadata)),
+                        )
+
+            if best is not None:
+                merge_references(batch.documents[best].metadata, document.metadata or {})
+                dropped += 1
+                continue
+            fresh.append(batch.add(signature, copy))
+
+        if index is not None:
+            index.extend([batch.signature(position) for position in fresh],
+                         [batch.documents[position] for position in fresh])
+    return batch.documents, dropped
+
+
+@lru_cache(maxsize=None)
+def _signature_index(directory, num_perm, bands):
+    return SignatureIndex(num_perm, bands, directory)
+
+
+def get_signature_index():
+    """Return the process-wide persisted index for the ``dedup`` settings in config.yaml."""
+    num_perm = get_setting("dedup.num_perm", 128)
+    shingle_size = get_setting("dedup.shingle_size", 3)
+    # Signatures depend on the permutations and shingles; bands only on how they are bucketed
+    directory = os.path.join(get_setting("cache.dedup_dir", "cache/dedup"), f"minhash-{num_perm}-{shingle_size}")
+    return _signature_index(directory, num_perm, get_setting("dedup.bands", 16))
+
+
+def deduplicate(documents):
+    """``dedupe_chunks`` with the ``dedup`` settings from config.yaml (no-op when disabled).
+
+    With ``dedup.persist`` chunks are also checked against every chunk kept
+    by earlier ingests.
+    """
+    persist = get_setting("dedup.persist", True)
+    if not get_setting("dedup.enabled", True) or len(documents) < (1 if persist else 2):
+        return documents, 0
+    return dedupe_chunks(
+        documents,
+        threshold=get_setting("dedup.threshold", 0.8),
+        num_perm=get_setting("dedup.num_perm", 128),
+        bands=get_setting("dedup.bands", 16),
+        shingle_size=get_setting("dedup.shingle_size", 3),
+        index=get_signature_index() if persist else None,
+    )
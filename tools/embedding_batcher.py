@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class _PendingBatch:
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.vectors = None
+        self.error = None
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Coalesce concurrent ``embed_documents`` calls into shared model calls.
+
+    Callers enqueue their texts and block; a single worker thread waits up
+    to ``max_wait_ms`` after the first request for more to arrive (or until
+    ``max_batch_size`` texts are queued), embeds them all in one call to the
+    wrapped provider and hands each caller its slice of the result.
+    """
+
+    def __init__(self, inner, max_batch_size=256, max_wait_ms=10):
+        self.inner = inner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            size += len(pending.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for pending in batch for text in pending.texts]
+            try:
+                if hasattr(self.inner, "encode"):
+                    vectors = self.inner.encode(texts)
+                else:
+                    vectors = self.inner.embed_documents(texts)
+                vectors = np.asarray(vectors, dtype=np.float32)
+                self.batches += 1
+                offset = 0
+                for pending in batch:
+                    pending.vectors = vectors[offset:offset + len(pending.texts)]
+                    offset += len(pending.texts)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                pending.done.set()
+
+    def encode(self, texts):
+        """Embed texts into a float32 matrix as part of the next shared batch."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        self._ensure_worker()
+        pending = _PendingBatch(texts)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.vectors
+
+    def embed_documents(self, texts):
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text):
+        # Single queries are latency-sensitive, so they skip the batching window
+        return self.inner.embed_query(text)
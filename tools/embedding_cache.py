@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools.file_lock import file_lock
+from tools.metrics import count_cache
+
+DIGEST_SIZE = 32
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an embeddings provider with a persistent per-model vector cache.
+
+    Vectors are appended to ``vectors.f32`` (raw float32 rows, read through
+    a memory map) and the sha256 of (model, text) for each row to
+    ``keys.bin``. Only texts never seen before reach the wrapped model.
+    The files are append-only; appends and reloads hold an exclusive
+    ``flock`` on the directory, so every process sharing the cache sees
+    the same rows and picks up the ones the others added.
+    """
+
+    def __init__(self, inner, model_name, directory="cache/embeddings"):
+        self.inner = inner
+        self.model_name = model_name
+        self.directory = os.path.join(directory, re.sub(r"[^\w.-]", "_", model_name))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._rows = None
+        self._count = 0
+        self._dim = None
+        self._vectors = None
+
+    @property
+    def _keys_path(self):
+        return os.path.join(self.directory, "keys.bin")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).digest()
+
+    def _sync(self):
+        """Catch up with rows appended since the last sync, by this or another process.
+
+        Call with the file lock held; the vectors stay on disk.
+        """
+        if self._rows is None:
+            self._rows = {}
+        if self._dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+        # Under the lock a mismatch means a crash between the two appends; trust the shorter file
+        count = min(_file_size(self._keys_path) // DIGEST_SIZE, _file_size(self._vectors_path) // (4 * self._dim))
+        for path, size in ((self._keys_path, count * DIGEST_SIZE), (self._vectors_path, count * 4 * self._dim)):
+            if _file_size(path) != size:
+                os.truncate(path, size)
+        if count < self._count:
+            # The cache was cleared underneath us
+            self._rows, self._count = {}, 0
+        if count > self._count:
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._count * DIGEST_SIZE)
+                keys = f.read((count - self._count) * DIGEST_SIZE)
+            for row in range(self._count, count):
+                offset = (row - self._count) * DIGEST_SIZE
+                self._rows[keys[offset:offset + DIGEST_SIZE]] = row
+        if count != self._count:
+            self._count = count
+            self._vectors = None
+
+    def _matrix(self):
+        if self._vectors is None and self._count:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                      shape=(self._count, self._dim))
+        return self._vectors
+
+    def _append(self, keys, vectors):
+        if self._dim is None:
+            self._dim = vectors.shape[1]
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_name, "dim": self._dim}, f)
+        # Drop the map before growing the file (required on Windows)
+        self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self._keys_path, "ab") as f:
+            f.write(b"".join(keys))
+        for key in keys:
+            self._rows[key] = self._count
+            self._count += 1
+
+    def embed_array(self, texts):
+        """Embed texts into a float32 matrix, only calling the model on misses."""
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        with self._lock, file_lock(self.directory):
+            self._sync()
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self._rows and key not in missing:
+                    missing[key] = text
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        count_cache("embeddings", True, len(texts) - len(missing))
+        count_cache("embeddings", False, len(missing))
+
+        # Call the model without holding the lock so concurrent callers overlap
+        if missing:
+            if hasattr(self.inner, "encode"):
+                new_vectors = self.inner.encode(list(missing.values()))
+            else:
+                new_vectors = self.inner.embed_documents(list(missing.values()))
+            new_vectors = np.asarray(new_vectors, dtype=np.float32)
+
+        with self._lock, file_lock(self.directory):
+            self._sync()
+            if missing:
+                # Another caller or process may have stored some of the same texts meanwhile
+                missing_keys = list(missing)
+                fresh = [i for i, key in enumerate(missing_keys) if key not in self._rows]
+                if fresh:
+                    self._append([missing_keys[i] for i in fresh], new_vectors[fresh])
+
+            if not texts:
+                return np.zeros((0, self._dim or 0), dtype=np.float32)
+            matrix = self._matrix()
+            return np.array(matrix[[self._rows[key] for key in keys]], dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        # Queries are rarely repeated, so they go straight to the model
+        return self.inner.embed_query(text)
+
+    def stats(self):
+        """Return hit/miss counters and the number of cached vectors."""
+        with self._lock, file_lock(self.directory):
+            self._sync()
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._rows)}
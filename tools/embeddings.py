@@ -0,0 +1,135 @@
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import get_setting
+from tools.embedding_batcher import MicroBatchingEmbeddings
+from tools.embedding_cache import CachedEmbeddings
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Local CPU embeddings through sentence-transformers.
+
+    Texts are encoded in batches of ``batch_size``; ingests of at least
+    ``multi_process_threshold`` texts are spread over a pool of worker
+    processes. ``encode`` returns a float32 NumPy matrix, the LangChain
+    methods convert it to lists.
+    """
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=64, device="cpu",
+                 normalize=True, multi_process_threshold=2000, num_processes=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self.normalize = normalize
+        self.multi_process_threshold = multi_process_threshold
+        self.num_processes = num_processes or os.cpu_count() or 1
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                # Imported here so the package is only needed for this provider
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def encode(self, texts):
+        """Encode texts into a ``(len(texts), dim)`` float32 array."""
+        model = self._get_model()
+        if not texts:
+            return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        if len(texts) >= self.multi_process_threshold and self.num_processes > 1:
+            pool = model.start_multi_process_pool(target_devices=[self.device] * self.num_processes)
+            try:
+                vectors = model.encode_multi_process(texts, pool, batch_size=self.batch_size)
+            finally:
+                model.stop_multi_process_pool(pool)
+            if self.normalize:
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors = vectors / np.maximum(norms, 1e-12)
+        else:
+            vectors = model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=self.normalize,
+                show_progress_bar=False,
+            )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.encode([text])[0].tolist()
+
+
+def _build_provider(provider, model):
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=model) if model else OpenAIEmbeddings()
+    if provider in ("huggingface", "sentence-transformers", "local"):
+        return SentenceTransformerEmbeddings(
+            model_name=model or "all-MiniLM-L6-v2",
+            batch_size=get_setting("embeddings.batch_size", 64),
+            device=get_setting("embeddings.device", "cpu"),
+            multi_process_threshold=get_setting("embeddings.multi_process_threshold", 2000),
+            num_processes=get_setting("embeddings.num_processes"),
+        )
+    if provider == "fake":
+        # Deterministic stand-in for offline load tests; no model, no network
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=get_setting("embeddings.fake_size", 384))
+    raise ValueError(f"Unknown embeddings provider: {provider}")
+
+
+@lru_cache(maxsize=None)
+def _build_embeddings(provider, model):
+    embeddings = _build_provider(provider, model)
+    model_name = model or getattr(embeddings, "model", None) or getattr(embeddings, "model_name", provider)
+    if get_setting("embeddings.micro_batch.enabled", False):
+        # Concurrent ingests share model calls instead of each making their own
+        embeddings = MicroBatchingEmbeddings(
+            embeddings,
+            max_batch_size=get_setting("embeddings.micro_batch.max_batch_size", 256),
+            max_wait_ms=get_setting("embeddings.micro_batch.max_wait_ms", 10),
+        )
+        embeddings.model_name = model_name
+    if not get_setting("embeddings.cache", True):
+        return embeddings
+    # Every text is embedded at most once per model, across collections and runs
+    return CachedEmbeddings(
+        embeddings,
+        model_name,
+        directory=get_setting("cache.embeddings_dir", "cache/embeddings"),
+    )
+
+
+def get_embeddings(provider=None, model=None):
+    """Return the embeddings configured under ``embeddings`` in config.yaml.
+
+    Instances are shared per (provider, model) so a local model is loaded
+    once per process, and wrapped in the on-disk embedding cache unless
+    ``embeddings.cache`` is false.
+    """
+    if provider is None:
+        provider = get_setting("embeddings.provider", "openai")
+        if model is None:
+            model = get_setting("embeddings.model")
+    return _build_embeddings(provider, model)
+
+
+def get_query_embeddings(provider=None, model=None):
+    """Like ``get_embeddings`` but bypassing the on-disk cache.
+
+    For embedding queries in bulk: they are rarely repeated, and writing
+    them into the document cache would only grow it.
+    """
+    embeddings = get_embeddings(provider, model)
+    return embeddings.inner if isinstance(embeddings, CachedEmbeddings) else embeddings
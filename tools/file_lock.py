@@ -0,0 +1,27 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, stores stay single-writer
+    fcntl = None
+
+
+@contextmanager
+def file_lock(directory, name=".lock"):
+    """Hold an exclusive ``flock`` on a lock file in ``directory``.
+
+    Serializes appends and reloads of an on-disk store between every
+    process sharing it (app, service, server, batch) as well as between
+    threads. A no-op where ``fcntl`` is unavailable.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, name), "a+b") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
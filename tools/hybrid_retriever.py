@@ -0,0 +1,63 @@
+from typing import Any, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """Fuse ranked lists of keys; each list adds 1 / (rrf_k + rank) per key."""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense vector search and BM25 over the same chunks, fused with RRF.
+
+    Each side returns ``candidate_k`` chunks for the query (restricted by
+    ``where``); the fused top ``k`` are returned.
+    """
+
+    vector_store: Any
+    bm25_index: Any
+    k: int = 8
+    candidate_k: int = 20
+    rrf_k: int = 60
+    where: Optional[dict] = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        dense = self.vector_store.similarity_search(query, k=self.candidate_k, filter=self.where)
+        return self._fuse(dense, self._sparse(query))
+
+    def retrieve_by_vectors(self, queries, vectors):
+        """Retrieve for many queries whose embeddings are already computed.
+
+        The dense side is one batched search (``search_by_vectors``); BM25
+        still runs per query.
+        """
+        from tools.chromadb_tool import search_by_vectors
+        dense = search_by_vectors(self.vector_store, vectors, self.candidate_k, self.where)
+        return [self._fuse(hits, self._sparse(query)) for query, hits in zip(queries, dense)]
+
+    def _sparse(self, query):
+        return [
+            Document(page_content=text, metadata=metadata)
+            for _, text, metadata, _ in self.bm25_index.search(query, k=self.candidate_k, where=self.where)
+        ]
+
+    def _fuse(self, dense, sparse):
+        # The same chunk from either side fuses on (video, text)
+        by_key = {}
+        rankings = []
+        for documents in (dense, sparse):
+            ranking = []
+            for document in documents:
+                key = (document.metadata.get("video_id"), document.page_content)
+                by_key.setdefault(key, document)
+                ranking.append(key)
+            rankings.append(ranking)
+
+        fused = reciprocal_rank_fusion(rankings, self.rrf_k)
+        return [by_key[key] for key in fused[:self.k]]
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_videos (
+    store TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    indexed REAL NOT NULL,
+    PRIMARY KEY (store, video_id)
+)
+"""
+
+
+class IndexMarkers:
+    """SQLite record of the videos whose chunks are completely in a vector store.
+
+    A video is marked only after every one of its chunks was written, so
+    one interrupted or still running ingest never makes a video look
+    indexed. ``store`` keys the markers by backend and collection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def mark(self, store, video_ids):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO indexed_videos VALUES (?, ?, ?)",
+                [(store, video_id, now) for video_id in set(video_ids)],
+            )
+
+    def marked(self, store, video_ids):
+        """Return the subset of ``video_ids`` marked complete in ``store``."""
+        video_ids = list(set(video_ids))
+        if not video_ids:
+            return set()
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT video_id FROM indexed_videos WHERE store = ? AND video_id IN ({','.join('?' * len(video_ids))})",
+                [store] + video_ids,
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def clear(self, store):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM indexed_videos WHERE store = ?", (store,))
@@ -0,0 +1,226 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    urls TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_videos (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+
+def _process_alive(pid):
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class IngestJobStore:
+    """SQLite record of ingest jobs and the status of each of their videos.
+
+    A job is claimed by the process running it (``owner`` is its pid), so
+    several app processes sharing the file never run the same job twice,
+    and jobs left behind by a dead process can be taken over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, urls):
+        """Record a new queued job for ``urls`` and return its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT INTO jobs VALUES (?, ?, ?, NULL, ?, ?)", (job_id, json.dumps(urls), QUEUED, now, now))
+            conn.executemany(
+                "INSERT INTO job_videos VALUES (?, ?, ?, ?, NULL, ?)",
+                [(job_id, position, url, QUEUED, now) for position, url in enumerate(urls)],
+            )
+        return job_id
+
+    def claim(self, job_id):
+        """Take ownership of an unfinished job unless a live process holds it.
+
+        The update only applies if the owner is still the one we saw, so of
+        several processes racing for the same job exactly one wins.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT status, owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row[0] in FINISHED:
+                return False
+            owner = row[1]
+            if owner != os.getpid() and _process_alive(owner):
+                return False
+            cursor = conn.execute(
+                "UPDATE jobs SET owner = ?, updated = ? WHERE id = ? AND owner IS ? AND status NOT IN (?, ?)",
+                (os.getpid(), time.time(), job_id, owner) + FINISHED,
+            )
+            return cursor.rowcount == 1
+
+    def set_job(self, job_id, status):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def set_video(self, job_id, position, status, error=None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE job_videos SET status = ?, error = ?, updated = ? WHERE job_id = ? AND position = ?",
+                (status, error, time.time(), job_id, position),
+            )
+
+    def get(self, job_id):
+        """Return the job with per-video statuses and counts, or None if unknown."""
+        with self._lock, self._connect() as conn:
+            job = conn.execute("SELECT urls, status, created, updated FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            videos = conn.execute(
+                "SELECT position, url, status, error FROM job_videos WHERE job_id = ? ORDER BY position",
+                (job_id,),
+            ).fetchall()
+        videos = [{"position": position, "url": url, "status": status, "error": error}
+                  for position, url, status, error in videos]
+        return {
+            "id": job_id,
+            "urls": json.loads(job[0]),
+            "status": job[1],
+            "created": job[2],
+            "updated": job[3],
+            "videos": videos,
+            "total": len(videos),
+            "done": sum(video["status"] == DONE for video in videos),
+            "failed": sum(video["status"] == FAILED for video in videos),
+        }
+
+    def unfinished(self):
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status NOT IN (?, ?) ORDER BY created", FINISHED
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class IngestJobs:
+    """Run ingest jobs in the background, marking videos done as they land.
+
+    ``ingest(urls, on_indexed)`` fetches, chunks and dedupes all of its
+    urls in one pass, calls ``on_indexed(url)`` as each video becomes
+    searchable and returns the video ids it indexed. Each job runs on a
+    worker thread (ingest is dominated by network and embedding calls)
+    and marks every video done only once it is in the index, so
+    ``resume`` restarts an interrupted job with just the videos it had not
+    completed. Callers poll ``status`` and can query the videos in
+    ``ready_urls`` while the rest are still being ingested.
+    """
+
+    def __init__(self, store, ingest, max_workers=2):
+        self.store = store
+        self._ingest = ingest
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-job")
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def submit(self, urls):
+        """Queue ``urls`` for ingest and return the job id."""
+        job_id = self.store.create(list(urls))
+        self._start(job_id)
+        return job_id
+
+    def resume(self):
+        """Restart the unfinished jobs no live process is running; return their ids."""
+        return [job_id for job_id in self.store.unfinished() if self._start(job_id)]
+
+    def status(self, job_id):
+        return self.store.get(job_id)
+
+    def ready_urls(self, job_id):
+        """Urls of this job's videos that are indexed and can be queried."""
+        job = self.store.get(job_id)
+        if job is None:
+            return []
+        return [video["url"] for video in job["videos"] if video["status"] == DONE]
+
+    def _start(self, job_id):
+        with self._lock:
+            if job_id in self._active or not self.store.claim(job_id):
+                return False
+            self._active.add(job_id)
+        self._executor.submit(self._run, job_id)
+        return True
+
+    def _run(self, job_id):
+        try:
+            self.store.set_job(job_id, RUNNING)
+            positions = {}
+            for video in self.store.get(job_id)["videos"]:
+                if video["status"] not in FINISHED:
+                    positions.setdefault(video["url"], []).append(video["position"])
+                    self.store.set_video(job_id, video["position"], RUNNING)
+
+            def indexed(url):
+                for position in positions.pop(url, []):
+                    self.store.set_video(job_id, position, DONE)
+
+            error = "No transcript could be indexed"
+            if positions:
+                try:
+                    self._ingest(list(positions), indexed)
+                except Exception as e:
+                    error = str(e)
+            for url_positions in positions.values():
+                for position in url_positions:
+                    self.store.set_video(job_id, position, FAILED, error)
+            job = self.store.get(job_id)
+            self.store.set_job(job_id, DONE if job["done"] else FAILED)
+        except Exception as e:
+            print(f"Error running ingest job {job_id}: {e}")
+            self.store.set_job(job_id, FAILED)
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tools.chunking import count_tokens
+from tools.metrics import count_tokens_used, log_stage, registry
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """Callback that times every LLM call and counts its tokens.
+
+    Attached to the shared LLM instances in ``main.get_llm``, so it sees
+    calls from the direct chain, the stuff chain and the agent alike.
+    Records total and time-to-first-token durations under the ``llm`` and
+    ``llm_first_token`` stages. Token counts come from the provider's usage
+    report when it sends one, otherwise they are counted locally.
+    """
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, prompt_tokens):
+        with self._lock:
+            self._calls[run_id] = {"started": time.perf_counter(), "prompt_tokens": prompt_tokens,
+                                   "first_token": None}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = "\n".join(str(message.content) for batch in messages for message in batch)
+        self._start(run_id, count_tokens(prompt))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, sum(count_tokens(prompt) for prompt in prompts))
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.get(run_id)
+            if call is not None and call["first_token"] is None:
+                call["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        elapsed = time.perf_counter() - call["started"]
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", call["prompt_tokens"])
+        completion_tokens = usage.get("completion_tokens")
+        if completion_tokens is None:
+            text = "".join(generation.text for generations in response.generations for generation in generations)
+            completion_tokens = count_tokens(text)
+
+        registry.observe("qa_stage_seconds", elapsed, stage="llm")
+        if call["first_token"] is not None:
+            registry.observe("qa_stage_seconds", call["first_token"] - call["started"], stage="llm_first_token")
+        count_tokens_used("prompt", prompt_tokens, self.model_name)
+        count_tokens_used("completion", completion_tokens, self.model_name)
+        log_stage("llm", "ok", round(elapsed * 1000, 3), model=self.model_name,
+                  prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is not None:
+            registry.inc("qa_stage_errors_total", stage="llm")
+            log_stage("llm", "error", model=self.model_name, error=str(error))
@@ -0,0 +1,29 @@
+def matches_filter(metadata, where):
+    """Evaluate a Chroma-style ``where`` filter against one metadata dict.
+
+    Supports plain equality, ``$eq``/``$ne``/``$in``/``$nin`` and the
+    ``$and``/``$or`` combinators, which is what the retrievers here build.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
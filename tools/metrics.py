@@ -0,0 +1,149 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from config import get_setting
+
+logger = logging.getLogger("qa_bot.metrics")
+
+# Histogram buckets for stage durations, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "qa_stage_seconds": "Time spent in each pipeline stage.",
+    "qa_stage_errors_total": "Pipeline stages that raised.",
+    "qa_tokens_total": "Tokens sent to and generated by the LLM.",
+    "qa_cache_requests_total": "Cache lookups by cache and result.",
+    "qa_items_total": "Items processed by each pipeline stage.",
+}
+
+
+class MetricsRegistry:
+    """In-process counters and histograms, exported in Prometheus text format.
+
+    Series are keyed by metric name and a sorted tuple of label pairs. All
+    updates take one lock; they are a few dict operations each, so the
+    cost on the hot path is negligible next to any stage worth timing.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """Return plain-dict copies of every counter and histogram."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**value, "buckets": list(value["buckets"])} for key, value in self._histograms.items()}
+        return counters, histograms
+
+    def render_prometheus(self):
+        """Render all series in the Prometheus text exposition format."""
+        counters, histograms = self.snapshot()
+        lines = []
+        for name in sorted({key[0] for key in counters}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for (series, labels), value in sorted(counters.items()):
+                if series == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name in sorted({key[0] for key in histograms}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for (series, labels), histogram in sorted(histograms.items()):
+                if series != name:
+                    continue
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+registry = MetricsRegistry()
+
+
+def log_event(event, **fields):
+    """Emit one structured (JSON) log line on the ``qa_bot.metrics`` logger."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+
+def log_stage(stage, status, duration_ms=None, **fields):
+    """Log one stage timing, unless ``metrics.log_stages`` is off."""
+    if get_setting("metrics.log_stages", True):
+        log_event("stage", stage=stage, status=status, duration_ms=duration_ms, **fields)
+
+
+@contextmanager
+def timed(stage, **fields):
+    """Time a pipeline stage into ``qa_stage_seconds`` and log it.
+
+    Extra keyword arguments go into the log line only (e.g. item counts),
+    so label cardinality stays at one series per stage.
+    """
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield fields
+    except BaseException:
+        status = "error"
+        registry.inc("qa_stage_errors_total", stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe("qa_stage_seconds", elapsed, stage=stage)
+        log_stage(stage, status, round(elapsed * 1000, 3), **fields)
+
+
+def count_cache(cache, hit, value=1):
+    """Record ``value`` lookups against a named cache as hits or misses."""
+    if value:
+        registry.inc("qa_cache_requests_total", value, cache=cache, result="hit" if hit else "miss")
+
+
+def count_tokens_used(kind, tokens, model=None):
+    """Record prompt or completion tokens for the LLM calls."""
+    registry.inc("qa_tokens_total", tokens, kind=kind, model=model or "unknown")
+
+
+def count_items(stage, value):
+    """Record how many items (videos, chunks, documents) a stage handled."""
+    registry.inc("qa_items_total", value, stage=stage)
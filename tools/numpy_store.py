@@ -0,0 +1,556 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from tools.metadata_filter import matches_filter
+
+QUANTIZATIONS = ("float32", "float16", "int8")
+
+# Rows upcast to float32 at a time when scoring a quantized matrix
+SCORE_BLOCK_ROWS = 16384
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k(scores, k):
+    """Indices of the ``k`` highest scores, best first (argpartition, then a small sort)."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def quantize(vectors, quantization):
+    """Encode float32 rows as ``(codes, scales)``; scales is None unless int8.
+
+    int8 uses one scale per vector (its largest absolute component / 127),
+    so every row keeps its full dynamic range.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    return vectors, None
+
+
+def approximate_scores(codes, scales, queries):
+    """Dot products of quantized rows with float32 queries, upcasting in blocks."""
+    scores = np.empty((len(codes), len(queries)), dtype=np.float32)
+    for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+        block = codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32) @ queries.T
+        if scales is not None:
+            block *= scales[start:start + SCORE_BLOCK_ROWS, None]
+        scores[start:start + SCORE_BLOCK_ROWS] = block
+    return scores
+
+
+def _grow(buffer, size, needed, shape_tail, dtype):
+    """Return a writable buffer with room for ``needed`` rows, keeping the first ``size``."""
+    if buffer is not None and not isinstance(buffer, np.memmap) and buffer.flags.writeable \
+            and len(buffer) >= needed:
+        return buffer
+    capacity = max(needed, 2 * (len(buffer) if buffer is not None else 0), 64)
+    grown = np.empty((capacity,) + shape_tail, dtype=dtype)
+    if size:
+        grown[:size] = buffer[:size]
+    return grown
+
+
+class NumpyVectorStore(VectorStore):
+    """Flat in-process vector index over a contiguous matrix.
+
+    Vectors are L2-normalized on insert, so a search is one matrix-vector
+    product (cosine similarity) plus ``argpartition`` for the top k. The
+    matrix grows by doubling its capacity; ids, texts and metadata live in
+    parallel lists. Video-id filters (what ``video_filter`` builds) are
+    answered from a precomputed column and an index of rows per boolean
+    flag, ``$or``-ed together; any other ``where`` clause falls back to
+    ``matches_filter`` per row.
+
+    ``quantization`` picks the in-memory search matrix: ``float32``, or
+    ``float16`` / per-vector-scaled ``int8`` codes at a half / quarter of
+    the size. Quantized searches shortlist ``rescore_factor * k``
+    candidates on the codes and rescore them against the float32 vectors.
+    NumPy has no fast float16 matrix product, so float16 codes are upcast
+    block by block on every search and are several times slower than
+    float32; use it only to save memory, and int8 when latency matters.
+
+    With a ``directory`` every write is persisted append-only: raw rows go
+    to ``vectors.f32`` (plus ``codes.f16``/``codes.i8`` and ``scales.f32``
+    when quantized), written in place at their row offsets, and ids, texts
+    and metadata to the ``records.jsonl`` log, which is compacted on load
+    once mostly superseded. An upsert writes only its own rows. The
+    float32 vectors are loaded back memory-mapped, so in quantized mode
+    only the codes stay resident; the float32 file is kept for rescoring,
+    so quantization shrinks memory, not disk.
+    """
+
+    def __init__(self, name, embedding, directory=None, quantization="float32", rescore_factor=4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}; expected one of {QUANTIZATIONS}")
+        self.name = name
+        self.embedding = embedding
+        self.directory = directory
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._lock = threading.Lock()
+        self._full = None
+        self._codes = None
+        self._scales = None
+        self._dim = None
+        self._size = 0
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._row_by_id = {}
+        self._video_ids = np.empty(0, dtype=object)
+        self._flag_rows = {}
+        if directory:
+            self._load()
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    @property
+    def quantized(self):
+        return self.quantization != "float32"
+
+    def resident_bytes(self):
+        """Bytes of vector data searched in memory (excludes memory-mapped float32 rows)."""
+        if not self.quantized:
+            return self._size * (self._dim or 0) * 4
+        size = self._size * (self._dim or 0) * self._codes.itemsize if self._codes is not None else 0
+        if self._scales is not None:
+            size += self._size * 4
+        if self._full is not None and not isinstance(self._full, np.memmap):
+            size += self._size * self._dim * 4
+        return size
+
+    # --- persistence -------------------------------------------------------
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _records_path(self):
+        return os.path.join(self.directory, "records.jsonl")
+
+    @property
+    def _codes_path(self):
+        return os.path.join(self.directory, "codes.f16" if self.quantization == "float16" else "codes.i8")
+
+    @property
+    def _scales_path(self):
+        return os.path.join(self.directory, "scales.f32")
+
+    def _rows_on_disk(self, path, row_bytes):
+        return os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+
+    def _load(self):
+        if not os.path.exists(self._records_path) and os.path.exists(os.path.join(self.directory, "records.json")):
+            self._migrate()
+        if not (os.path.exists(self._meta_path) and os.path.exists(self._records_path)):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self._dim = json.load(f)["dim"]
+
+        # Replay the log: a line with a document upserts a row, one without replaces its metadata
+        ids, texts, metadatas, row_by_id = [], [], [], {}
+        entries, length = 0, 0
+        with open(self._records_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn last write
+                record = json.loads(line)
+                entries += 1
+                length += len(line)
+                row = row_by_id.get(record["id"])
+                if "document" in record:
+                    if row is None:
+                        row_by_id[record["id"]] = len(ids)
+                        ids.append(record["id"])
+                        texts.append(record["document"])
+                        metadatas.append(record["metadata"])
+                        continue
+                    texts[row] = record["document"]
+                if row is not None:
+                    metadatas[row] = record["metadata"]
+
+        # Drop a torn last line so the next append starts on a line of its own
+        if os.path.getsize(self._records_path) != length:
+            os.truncate(self._records_path, length)
+
+        # Vectors are written before their records; keep the common prefix in case of a crash
+        size = min(len(ids), self._rows_on_disk(self._vectors_path, self._dim * 4))
+        self._size = size
+        self._ids = ids[:size]
+        self._texts = texts[:size]
+        self._metadatas = metadatas[:size]
+        self._row_by_id = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._video_ids = np.array([metadata.get("video_id") for metadata in self._metadatas], dtype=object)
+        for row, metadata in enumerate(self._metadatas):
+            self._index_flags(row, {}, metadata)
+        if size:
+            self._full = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(size, self._dim))
+        if entries > 2 * size or size < len(ids):
+            # Mostly superseded lines, or records past the last vector: rewrite the log with one line per row
+            self._write_atomic(self._records_path, lambda f: f.write(self._record_lines(range(size))))
+
+        # Codes saved under another mode would go stale as rows change in this one
+        current = {self._codes_path, self._scales_path} if self.quantization == "int8" else {self._codes_path}
+        for name in ("codes.f16", "codes.i8", "scales.f32"):
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path) and (not self.quantized or path not in current):
+                os.remove(path)
+
+        if self.quantized and size:
+            dtype = np.float16 if self.quantization == "float16" else np.int8
+            int8 = self.quantization == "int8"
+            if self._rows_on_disk(self._codes_path, self._dim * np.dtype(dtype).itemsize) >= size \
+                    and (not int8 or self._rows_on_disk(self._scales_path, 4) >= size):
+                self._codes = np.fromfile(self._codes_path, dtype=dtype, count=size * self._dim).reshape(size, self._dim)
+                self._scales = np.fromfile(self._scales_path, dtype=np.float32, count=size) if int8 else None
+            else:
+                # Saved unquantized or with another mode: encode from the float32 rows in blocks
+                parts = [quantize(self._full[start:start + SCORE_BLOCK_ROWS], self.quantization)
+                         for start in range(0, size, SCORE_BLOCK_ROWS)]
+                self._codes = np.concatenate([part[0] for part in parts])
+                self._scales = np.concatenate([part[1] for part in parts]) if int8 else None
+                self._write_atomic(self._codes_path, lambda f: f.write(self._codes.tobytes()))
+                if int8:
+                    self._write_atomic(self._scales_path, lambda f: f.write(self._scales.tobytes()))
+
+    def _migrate(self):
+        """Convert an index saved as ``vectors.npy`` + ``records.json`` to the append-only files."""
+        records_path = os.path.join(self.directory, "records.json")
+        with open(records_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        vectors = np.load(os.path.join(self.directory, "vectors.npy"), mmap_mode="r")
+        size = min(len(records["ids"]), len(vectors))
+        self._ids = records["ids"][:size]
+        self._texts = records["documents"][:size]
+        self._metadatas = records["metadatas"][:size]
+        with open(self._vectors_path, "wb") as f:
+            for start in range(0, size, SCORE_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32).tobytes())
+        self._write_atomic(self._meta_path, lambda f: f.write(json.dumps({"dim": vectors.shape[1]}).encode("utf-8")))
+        self._write_atomic(self._records_path, lambda f: f.write(self._record_lines(range(size))))
+        del vectors
+        for name in ("records.json", "vectors.npy", "codes.npy", "scales.npy"):
+            if os.path.exists(os.path.join(self.directory, name)):
+                os.remove(os.path.join(self.directory, name))
+        self._ids, self._texts, self._metadatas = [], [], []
+
+    def _write_atomic(self, path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _record_lines(self, rows, documents=True):
+        lines = []
+        for row in rows:
+            record = {"id": self._ids[row], "metadata": self._metadatas[row]}
+            if documents:
+                record["document"] = self._texts[row]
+            lines.append(json.dumps(record) + "\n")
+        return "".join(lines).encode("utf-8")
+
+    def _append_records(self, rows, documents=True):
+        with open(self._records_path, "ab") as f:
+            f.write(self._record_lines(rows, documents))
+
+    def _write_rows(self, path, updates, dtype):
+        """Write ``updates`` ({row: vector}) in place into a raw row-major file.
+
+        Runs of consecutive rows are written with one call; rows past the
+        end of the file append to it.
+        """
+        rows = sorted(updates)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            start = 0
+            while start < len(rows):
+                stop = start + 1
+                while stop < len(rows) and rows[stop] == rows[stop - 1] + 1:
+                    stop += 1
+                block = np.asarray([updates[row] for row in rows[start:stop]], dtype=dtype)
+                f.seek(rows[start] * block[0].nbytes)
+                f.write(block.tobytes())
+                start = stop
+
+    def _index_flags(self, row, old_metadata, metadata):
+        # Rows per metadata key whose value is True, for flag filters
+        for key, value in old_metadata.items():
+            if value is True:
+                self._flag_rows[key].discard(row)
+        for key, value in metadata.items():
+            if value is True:
+                self._flag_rows.setdefault(key, set()).add(row)
+
+    # --- writes ------------------------------------------------------------
+
+    def upsert_vectors(self, ids, embeddings, documents, metadatas):
+        """Insert or replace rows by id with precomputed embeddings."""
+        vectors = _normalize(embeddings)
+        if not len(ids):
+            return
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            new_count = len({doc_id for doc_id in ids if doc_id not in self._row_by_id})
+            needed = self._size + new_count
+
+            # Full-precision rows go to disk when quantized and persisted, else stay in memory
+            keep_full_on_disk = self.quantized and self.directory
+            if not keep_full_on_disk:
+                self._full = _grow(self._full, self._size, needed, (self._dim,), np.float32)
+            if self.quantized:
+                codes, scales = quantize(vectors, self.quantization)
+                self._codes = _grow(self._codes, self._size, needed, (self._dim,), codes.dtype)
+                if scales is not None:
+                    self._scales = _grow(self._scales, self._size, needed, (), np.float32)
+
+            video_ids = list(self._video_ids)
+            written = {}
+            for i, doc_id in enumerate(ids):
+                row = self._row_by_id.get(doc_id)
+                metadata = dict(metadatas[i] or {})
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_by_id[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._texts.append(documents[i])
+                    self._metadatas.append(metadata)
+                    video_ids.append(metadata.get("video_id"))
+                    self._index_flags(row, {}, metadata)
+                else:
+                    self._texts[row] = documents[i]
+                    self._index_flags(row, self._metadatas[row], metadata)
+                    self._metadatas[row] = metadata
+                    video_ids[row] = metadata.get("video_id")
+                written[row] = i
+                if not keep_full_on_disk:
+                    self._full[row] = vectors[i]
+                if self.quantized:
+                    self._codes[row] = codes[i]
+                    if scales is not None:
+                        self._scales[row] = scales[i]
+            self._video_ids = np.array(video_ids, dtype=object)
+
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+                if not os.path.exists(self._meta_path):
+                    self._write_atomic(self._meta_path, lambda f: f.write(json.dumps({"dim": self._dim}).encode("utf-8")))
+                # Vectors go down before their records, so a record never lacks its row
+                self._write_rows(self._vectors_path, {row: vectors[i] for row, i in written.items()}, np.float32)
+                if self.quantized:
+                    self._write_rows(self._codes_path, {row: codes[i] for row, i in written.items()}, codes.dtype)
+                    if scales is not None:
+                        self._write_rows(self._scales_path, {row: scales[i] for row, i in written.items()}, np.float32)
+                self._append_records(sorted(written))
+                if keep_full_on_disk:
+                    self._full = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                           shape=(self._size, self._dim))
+
+    def update_metadatas(self, ids, metadatas):
+        """Replace the metadata of stored rows; unknown ids are ignored."""
+        with self._lock:
+            video_ids = self._video_ids.copy()
+            changed = []
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self._row_by_id.get(doc_id)
+                if row is None:
+                    continue
+                changed.append(row)
+                metadata = dict(metadata or {})
+                self._index_flags(row, self._metadatas[row], metadata)
+                self._metadatas[row] = metadata
+                video_ids[row] = metadata.get("video_id")
+            self._video_ids = video_ids
+            if self.directory and changed:
+                self._append_records(changed, documents=False)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if ids is None:
+            import uuid
+            ids = [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self.upsert_vectors(list(ids), self.embedding.embed_documents(texts), texts, list(metadatas))
+        return list(ids)
+
+    def delete_collection(self):
+        with self._lock:
+            self._full = self._codes = self._scales = None
+            self._size = 0
+            self._ids, self._texts, self._metadatas = [], [], []
+            self._row_by_id = {}
+            self._video_ids = np.empty(0, dtype=object)
+            self._flag_rows = {}
+            if self.directory and os.path.isdir(self.directory):
+                shutil.rmtree(self.directory)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, name="default", directory=None, **kwargs):
+        store = cls(name, embedding, directory=directory, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    # --- reads -------------------------------------------------------------
+
+    def _snapshot(self):
+        # Rows are only appended or replaced in place, so the first ``size``
+        # entries of the lists stay valid without copying them
+        with self._lock:
+            if not self._size:
+                return 0, None, None, None, self._video_ids
+            return self._size, self._full, self._codes, self._scales, self._video_ids
+
+    def _mask(self, where, video_ids, limit=None):
+        """Boolean row mask for a ``where`` filter, or None for all rows.
+
+        With ``limit``, only the first ``limit`` matches are guaranteed to be
+        set: the per-row fallback stops scanning once it has found them.
+        """
+        if not where:
+            return None
+        if list(where) == ["$or"]:
+            masks = [self._mask(clause, video_ids, limit) for clause in where["$or"]]
+            if any(mask is None for mask in masks):
+                return None
+            return np.logical_or.reduce(masks)
+        if len(where) == 1 and next(iter(where.values())) is True:
+            key = next(iter(where))
+            with self._lock:
+                rows = np.fromiter(self._flag_rows.get(key, ()), dtype=np.int64)
+            mask = np.zeros(len(video_ids), dtype=bool)
+            mask[rows[rows < len(video_ids)]] = True
+            return mask
+        if list(where) == ["video_id"]:
+            condition = where["video_id"]
+            if not isinstance(condition, dict):
+                return video_ids == condition
+            if list(condition) == ["$in"]:
+                return np.isin(video_ids, list(condition["$in"]))
+            if list(condition) == ["$eq"]:
+                return video_ids == condition["$eq"]
+        if limit is None:
+            return np.fromiter((matches_filter(self._metadatas[row], where) for row in range(len(video_ids))),
+                               dtype=bool, count=len(video_ids))
+        mask = np.zeros(len(video_ids), dtype=bool)
+        found = 0
+        for row in range(len(video_ids)):
+            if found == limit:
+                break
+            if matches_filter(self._metadatas[row], where):
+                mask[row] = True
+                found += 1
+        return mask
+
+    def get(self, ids=None, where=None, limit=None, include=("documents", "metadatas")):
+        """Chroma-style ``get``: rows by id and/or filter, as parallel lists."""
+        if ids is None:
+            size, _, _, _, video_ids = self._snapshot()
+            mask = self._mask(where, video_ids[:size], limit)
+            rows = np.arange(size) if mask is None else np.flatnonzero(mask)
+            rows = rows[:limit].tolist()
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_by_id[doc_id] for doc_id in ids if doc_id in self._row_by_id]
+                if where:
+                    rows = [row for row in rows if matches_filter(self._metadatas[row], where)]
+                rows = rows[:limit]
+            else:
+                # The collection may have been deleted since the snapshot
+                rows = [row for row in rows if row < self._size]
+            result = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self._texts[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [dict(self._metadatas[row]) for row in rows]
+            return result
+
+    def _search_rows(self, queries, k, filter):
+        """Return ``[(rows, scores)]`` per query, best first."""
+        size, full, codes, scales, video_ids = self._snapshot()
+        if not size:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        mask = self._mask(filter, video_ids[:size])
+        rows = np.arange(size) if mask is None else np.flatnonzero(mask)
+        if not len(rows):
+            return [(rows, np.empty(0, dtype=np.float32)) for _ in queries]
+
+        if codes is None:
+            candidates = full[:size] if mask is None else full[rows]
+            scores = candidates @ queries.T
+            results = []
+            for column in range(len(queries)):
+                best = top_k(scores[:, column], k)
+                results.append((rows[best], scores[best, column]))
+            return results
+
+        # Shortlist on the quantized codes, then rescore against the float32 rows
+        approx = approximate_scores(
+            codes[:size] if mask is None else codes[rows],
+            None if scales is None else (scales[:size] if mask is None else scales[rows]),
+            queries,
+        )
+        results = []
+        for column, query in enumerate(queries):
+            shortlist = rows[top_k(approx[:, column], k * self.rescore_factor)]
+            order = np.sort(shortlist)  # sequential reads from the memory map
+            exact = np.asarray(full[order], dtype=np.float32) @ query
+            best = top_k(exact, k)
+            results.append((order[best], exact[best]))
+        return results
+
+    def similarity_search_by_vectors(self, vectors, k=4, filter=None):
+        """Batched search: one matrix product for all queries; returns ``[(Document, score)]`` per query."""
+        queries = _normalize(np.atleast_2d(vectors))
+        results = []
+        for rows, scores in self._search_rows(queries, k, filter):
+            hits = []
+            for row, score in zip(rows.tolist(), scores.tolist()):
+                document = Document(page_content=self._texts[row], metadata=dict(self._metadatas[row]), id=self._ids[row])
+                hits.append((document, score))
+            results.append(hits)
+        return results
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vectors([self.embedding.embed_query(query)], k, filter)[0]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [document for document, _ in self.similarity_search_by_vectors([embedding], k, filter)[0]]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
@@ -0,0 +1,23 @@
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+
+class StubChatModel(FakeListChatModel):
+    """Canned-answer chat model with the same simulated latency on every path.
+
+    ``FakeListChatModel`` sleeps ``sleep`` seconds per streamed character but
+    only once for a whole non-streaming call; here ``invoke`` (and
+    ``ainvoke``, which runs it on a thread) take as long as streaming the
+    full answer would.
+    """
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        response = self.responses[self.i]
+        if self.i < len(self.responses) - 1:
+            self.i += 1
+        else:
+            self.i = 0
+        if self.sleep is not None:
+            time.sleep(self.sleep * len(response))
+        return response
@@ -0,0 +1,137 @@
+import json
+import os
+import re
+import tempfile
+import threading
+
+from config import get_setting
+
+LEGACY_CACHE_FILE = "transcript_cache.json"
+LEGACY_MARKER = ".legacy_imported"
+
+
+class TranscriptStore:
+    """Per-video transcript cache: one JSON shard per video, LRU-bounded by count.
+
+    Nothing is read until a transcript is requested, writes go through a temp
+    file and ``os.replace`` so readers never see a half-written shard, and the
+    shard mtime doubles as the LRU clock.
+    """
+
+    def __init__(self, directory, max_entries=5000, legacy_file=LEGACY_CACHE_FILE):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.legacy_file = legacy_file
+        self._lock = threading.Lock()
+        self._count = None
+
+    def _path(self, video_id):
+        safe_id = re.sub(r"[^\w-]", "_", video_id)
+        return os.path.join(self.directory, f"{safe_id}.json")
+
+    def get(self, video_id):
+        """Return the cached transcript for a video, or None on a miss."""
+        path = self._path(video_id)
+        if not os.path.exists(path):
+            self._import_legacy_cache()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                transcript = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Bump the shard to most recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return transcript
+
+    def put(self, video_id, transcript):
+        """Atomically write a transcript shard and evict old ones if over budget."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(video_id)
+        is_new = not os.path.exists(path)
+        self._write_atomic(path, transcript)
+
+        with self._lock:
+            if self._count is None:
+                self._count = len(self._shards())
+            elif is_new:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def clear(self):
+        """Remove every shard from the store."""
+        for entry in self._shards():
+            os.remove(entry.path)
+        with self._lock:
+            self._count = 0
+
+    def _write_atomic(self, path, transcript):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(transcript, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _shards(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(".json")]
+
+    def _evict(self):
+        # Drop least recently used shards down to 90% of the budget
+        shards = sorted(self._shards(), key=lambda entry: entry.stat().st_mtime)
+        target = int(self.max_entries * 0.9)
+        for entry in shards[:max(0, len(shards) - target)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        self._count = len(self._shards())
+        print(f"[Cache] Evicted transcripts down to {self._count} entries.")
+
+    def _import_legacy_cache(self):
+        """Split the old single-file cache into shards, once."""
+        marker = os.path.join(self.directory, LEGACY_MARKER)
+        if not self.legacy_file or not os.path.exists(self.legacy_file) or os.path.exists(marker):
+            return
+        with self._lock:
+            if os.path.exists(marker):
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            try:
+                with open(self.legacy_file, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read legacy transcript cache: {e}")
+                legacy = {}
+            for video_id, transcript in legacy.items():
+                path = self._path(video_id)
+                if not os.path.exists(path):
+                    self._write_atomic(path, transcript)
+            open(marker, "w").close()
+            self._count = None
+            print(f"[Cache] Imported {len(legacy)} transcripts from {self.legacy_file}.")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_transcript_store():
+    """Return the process-wide transcript store configured in config.yaml."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TranscriptStore(
+                get_setting("cache.transcripts_dir", "transcript_cache"),
+                max_entries=get_setting("cache.max_transcripts", 5000),
+            )
+    return _store
@@ -1,13 +1,28 @@
 import os
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
 
+from config import get_setting
+
 # Load environment variables
 load_dotenv()
 
 # Set up the YouTube Data API client
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+YOUTUBE_VIDEOS_ENDPOINT = "https://www.googleapis.com/youtube/v3/videos"
+
+# The videos endpoint accepts at most 50 ids per call
+MAX_IDS_PER_REQUEST = 50
+REQUEST_TIMEOUT = 10
+
+# Shared across Streamlit reruns and sessions: the module outlives each script run
+_session = None
+_session_lock = threading.Lock()
+_metadata_cache = {}
+_cache_lock = threading.Lock()
 
 def extract_video_id(url):
     """Extract the video ID from a YouTube URL."""
@@ -28,59 +43,115 @@ def extract_video_id(url):
     # If nothing matches
     return None
 
-def fetch_video_metadata(video_url: str):
+def _get_session():
+    """Return a pooled requests session for the YouTube Data API."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2)
+            _session.mount("https://", adapter)
+    return _session
+
+def _placeholder_metadata(title, description, views):
+    return {
+        "title": title,
+        "description": description,
+        "thumbnail_url": "",
+        "views": views
+    }
+
+def _parse_video_item(video_info):
+    return {
+        "title": video_info["snippet"]["title"],
+        "description": video_info["snippet"]["description"],
+        "thumbnail_url": video_info["snippet"]["thumbnails"]["high"]["url"],
+        "views": video_info["statistics"]["viewCount"]
+    }
+
+def _fetch_metadata_batch(video_ids, api_key):
+    """Fetch up to 50 videos in a single API call."""
+    response = _get_session().get(
+        YOUTUBE_VIDEOS_ENDPOINT,
+        params={"part": "snippet,statistics", "id": ",".join(video_ids), "key": api_key},
+        timeout=REQUEST_TIMEOUT
+    )
+    data = response.json()
+    found = {item["id"]: _parse_video_item(item) for item in data.get("items", [])}
+    if "error" in data and not found:
+        raise RuntimeError(data["error"].get("message", "YouTube API error"))
+    return {
+        video_id: found.get(video_id) or _placeholder_metadata(
+            "Video not found", "The requested video could not be found", "0")
+        for video_id in video_ids
+    }
+
+def fetch_videos_metadata(video_urls):
     """
-    Fetch metadata for a YouTube video given its URL using direct API requests.
+    Fetch metadata for many YouTube videos at once.
+
+    Returns a dict mapping each url to its metadata (None for urls without a
+    video id). Cached entries are served without any network call; misses
+    are fetched 50 ids per request, with batches running in parallel.
     """
-    video_id = extract_video_id(video_url)
-    if not video_id:
-        return None
-        
+    ids_by_url = {url: extract_video_id(url) for url in video_urls}
+    results = {url: None for url, video_id in ids_by_url.items() if not video_id}
+
     # Get YouTube API key from environment
     api_key = os.environ.get("YOUTUBE_API_KEY", YOUTUBE_API_KEY)
-    
+
     if not api_key:
         print("YouTube API key not found. Please check your .env file.")
-        return {
-            "title": "Video metadata unavailable (API key not configured)",
-            "description": "Configure YOUTUBE_API_KEY in your .env file to see video details",
-            "thumbnail_url": "",
-            "views": "Unknown"
-        }
-    
-    # Make a direct request to the YouTube API
-    url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet,statistics&id={video_id}&key={api_key}"
-    
-    try:
-        response = requests.get(url)
-        # Convert the response to JSON first
-        data = response.json()
-        
-        # Now access the data as a dictionary
-        if "items" in data and data["items"]:
-            video_info = data["items"][0]
-            title = video_info["snippet"]["title"]
-            description = video_info["snippet"]["description"]
-            thumbnail_url = video_info["snippet"]["thumbnails"]["high"]["url"]
-            views = video_info["statistics"]["viewCount"]
-            return {
-                "title": title,
-                "description": description,
-                "thumbnail_url": thumbnail_url,
-                "views": views
-            }
-        else:
-            return {
-                "title": "Video not found",
-                "description": "The requested video could not be found",
-                "thumbnail_url": "",
-                "views": "0"
-            }
-    except Exception as e:
-        print(f"Error fetching video metadata: {e}")
-        return {
-            "title": "Error fetching video data",
-            "description": f"An error occurred: {str(e)}",
-            "thumbnail_url": "",
-            "views": "Unknown"
-        }
+        for url, video_id in ids_by_url.items():
+            if video_id:
+                results[url] = _placeholder_metadata(
+                    "Video metadata unavailable (API key not configured)",
+                    "Configure YOUTUBE_API_KEY in your .env file to see video details",
+                    "Unknown")
+        return results
+
+    ttl = get_setting("cache.metadata_ttl", 3600)
+    now = time.monotonic()
+    metadata_by_id = {}
+    with _cache_lock:
+        for video_id in set(filter(None, ids_by_url.values())):
+            entry = _metadata_cache.get(video_id)
+            if entry and entry[0] > now:
+                metadata_by_id[video_id] = entry[1]
+
+    missing = sorted(set(filter(None, ids_by_url.values())) - set(metadata_by_id))
+    batches = [missing[i:i + MAX_IDS_PER_REQUEST] for i in range(0, len(missing), MAX_IDS_PER_REQUEST)]
+
+    def fetch(batch):
+        try:
+            return _fetch_metadata_batch(batch, api_key), None
+        except Exception as e:
+            print(f"Error fetching video metadata: {e}")
+            return {}, e
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(4, len(batches))) as executor:
+            for batch, (fetched, error) in zip(batches, executor.map(fetch, batches)):
+                if error is not None:
+                    # Errors are reported but never cached
+                    for video_id in batch:
+                        metadata_by_id[video_id] = _placeholder_metadata(
+                            "Error fetching video data", f"An error occurred: {str(error)}", "Unknown")
+                    continue
+                with _cache_lock:
+                    for video_id, metadata in fetched.items():
+                        _metadata_cache[video_id] = (time.monotonic() + ttl, metadata)
+                metadata_by_id.update(fetched)
+
+    for url, video_id in ids_by_url.items():
+        if video_id:
+            results[url] = metadata_by_id[video_id]
+    return results
+
+def fetch_video_metadata(video_url: str):
+    """
+    Fetch metadata for a YouTube video given its URL using direct API requests.
+    """
+    return fetch_videos_metadata([video_url])[video_url]
@@ -1,40 +1,171 @@
-import os
-import json
-from youtube_transcript_api import YouTubeTranscriptApi  # Changed import
+import asyncio
+import math
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-CACHE_FILE = "transcript_cache.json"
-
-# Load existing cache
-if os.path.exists(CACHE_FILE):
-    with open(CACHE_FILE, "r", encoding="utf-8") as f:
-        transcript_cache = json.load(f)
-else:
-    transcript_cache = {}
+from tools.chunking import normalize_segments
+from tools.metrics import count_cache
+from tools.transcript_store import get_transcript_store
+from tools.utils import extract_video_id
 
 def get_video_id(url):
-    import re
-    match = re.search(r"v=([\w-]+)", url)
-    return match.group(1) if match else None
+    # Same parsing as the rest of the pipeline, so youtu.be and embed urls fetch too
+    return extract_video_id(url)
+
+def fetch_youtube_transcript(url, with_timestamps=False):
+    """Return the transcript for a video, raising if it can't be fetched.
 
-def get_youtube_transcript(url):
+    By default this is the list of caption lines; with ``with_timestamps``
+    each entry is a ``{text, start, duration}`` segment instead.
+    """
     video_id = get_video_id(url)
-    if video_id in transcript_cache:
+    if not video_id:
+        raise ValueError(f"Could not extract a video id from {url}")
+
+    store = get_transcript_store()
+    segments = store.get(video_id)
+    count_cache("transcripts", segments is not None)
+    if segments is not None:
         print(f"[Cache] Transcript for {video_id} loaded from cache.")
-        return transcript_cache[video_id]
-    
-    try:
+    else:
         # Get transcript using the YouTubeTranscriptApi
+        from youtube_transcript_api import YouTubeTranscriptApi
         transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-        
-        # Extract just the text from each transcript segment
-        transcript = [item['text'] for item in transcript_list]
-        
-        # Cache the transcript
-        transcript_cache[video_id] = transcript
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(transcript_cache, f, ensure_ascii=False, indent=2)
-        
-        return transcript
+
+        # Keep the timing of each segment alongside its text
+        segments = [
+            {"text": item["text"], "start": item.get("start"), "duration": item.get("duration")}
+            for item in transcript_list
+        ]
+
+        # Cache the transcript in its own shard
+        store.put(video_id, segments)
+
+    if with_timestamps:
+        return normalize_segments(segments)
+    return [segment["text"] for segment in normalize_segments(segments)]
+
+def get_youtube_transcript(url, with_timestamps=False):
+    try:
+        return fetch_youtube_transcript(url, with_timestamps=with_timestamps)
     except Exception as e:
         print(f"Error getting transcript: {e}")
         return []
+
+def _fetch_with_retries(url, retries, backoff, started, index):
+    started[index] = time.monotonic()
+    for attempt in range(retries + 1):
+        try:
+            return fetch_youtube_transcript(url, with_timestamps=True)
+        except ValueError:
+            # A malformed url won't get better by retrying
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            # Exponential backoff with a little jitter between attempts
+            delay = backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+            print(f"Retrying {url} in {delay:.1f}s after error: {e}")
+            time.sleep(delay)
+
+def fetch_transcripts(urls, max_workers=8, timeout=30.0, retries=2, backoff=1.0):
+    """Fetch transcripts for many videos concurrently.
+
+    Returns one ``(url, segments, error)`` tuple per url, in input order, where
+    segments carry their timestamps.
+    ``timeout`` bounds each video from the moment a worker picks it up,
+    retries and backoff included; a video that fails or times out gets its
+    error set and an empty transcript so callers can carry on.
+    """
+    if not urls:
+        return []
+
+    max_workers = max(1, min(max_workers, len(urls)))
+    results = [None] * len(urls)
+    started = [None] * len(urls)
+
+    # If every video finished within its timeout the whole batch ends by this
+    batch_deadline = time.monotonic() + timeout * math.ceil(len(urls) / max_workers)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcripts")
+    try:
+        pending = {
+            executor.submit(_fetch_with_retries, url, retries, backoff, started, i): i
+            for i, url in enumerate(urls)
+        }
+        while pending:
+            now = time.monotonic()
+
+            # Give up on videos that have run past their own deadline
+            for future, i in list(pending.items()):
+                expired = started[i] is not None and now - started[i] >= timeout
+                if expired or now >= batch_deadline:
+                    results[i] = (urls[i], [], TimeoutError(f"Timed out after {timeout}s"))
+                    del pending[future]
+            if not pending:
+                break
+
+            deadlines = [started[i] + timeout for i in pending.values() if started[i] is not None]
+            wait_for = min(deadlines + [batch_deadline]) - now
+            done, _ = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    results[i] = (urls[i], future.result(), None)
+                except Exception as e:
+                    results[i] = (urls[i], [], e)
+    finally:
+        # Don't block on fetches we already gave up on
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+async def afetch_transcripts(urls, max_workers=8, timeout=30.0, retries=2, backoff=1.0):
+    """Async ``fetch_transcripts``: same arguments and ``(url, segments, error)`` results.
+
+    Attempts run on a private pool of ``max_workers`` threads and each is
+    bounded by ``timeout``. A thread can't be cancelled, so a timed-out
+    attempt keeps its slot until the fetch actually returns; retries wait
+    for a free slot, and no more than ``max_workers`` fetches are ever live.
+    """
+    if not urls:
+        return []
+    max_workers = max(1, min(max_workers, len(urls)))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcripts")
+    slots = asyncio.Semaphore(max_workers)
+    loop = asyncio.get_running_loop()
+
+    def release(future):
+        slots.release()
+        # Retrieve the outcome of abandoned attempts so their errors aren't reported as unhandled
+        if not future.cancelled():
+            future.exception()
+
+    async def attempt(url):
+        await slots.acquire()
+        future = loop.run_in_executor(executor, fetch_youtube_transcript, url, True)
+        future.add_done_callback(release)
+        # Shielded: timing out stops the wait, the slot frees when the thread does
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    async def fetch(url):
+        for attempt_number in range(retries + 1):
+            try:
+                return url, await attempt(url), None
+            except ValueError as e:
+                return url, [], e
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    e = TimeoutError(f"Timed out after {timeout}s")
+                if attempt_number == retries:
+                    return url, [], e
+                delay = backoff * (2 ** attempt_number) * (1 + random.random() * 0.25)
+                print(f"Retrying {url} in {delay:.1f}s after error: {e}")
+                await asyncio.sleep(delay)
+
+    try:
+        return list(await asyncio.gather(*(fetch(url) for url in urls)))
+    finally:
+        # Don't block on attempts we already gave up on
+        executor.shutdown(wait=False)